@@ -1,79 +1,142 @@
 #!/usr/bin/env python3
 # Telegram-Slack poster with Notion-page preview  •  2025-05 build
-import re, os, asyncio, tempfile, requests, urllib.request
-from urllib.parse import urlparse
-from telethon import TelegramClient
-from telethon.errors import SessionPasswordNeededError, AuthRestartError
+import os, time, asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from PyQt6 import QtWidgets, QtCore, QtGui
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
-from notion_client import Client
+from dotenv import load_dotenv
+from broadcast import (Broadcaster, Prefetch, target_pages, fetch_notion_tags,
+                       fetch_notion_content, notion_cache, media_cache, metrics,
+                       read_group_export, PageContent, slack_error)
 from ui_mainwindow import Ui_MainWindow
 import qasync
 
-# ────────────────────────── constants ──────────────────────────
-NOTION_DATABASE_ID = "1d001a3f59f881c09cf2fc79f57ac4ac"
+THUMB_MAX_SIDE = 1024   # preview images are decoded down to this once
+THUMB_MEMORY   = 16     # decoded thumbnails kept in memory
 
-# ----------------------------------------------------------------------
-# helper: download any URL into a safe-named temporary file
-# ----------------------------------------------------------------------
-def _download_temp_file(url: str) -> str:
+# ─────────────────────── preview thumbnails ───────────────────────
+class ThumbnailCache:
     """
-    Download *url* into a secure tmp file and return its local path.
-    The original name is trimmed so it never exceeds the 255-char macOS limit.
+    Downscaled previews of media-cache images. Decoding happens in a small
+    worker pool (QImage, unlike QPixmap, may be used off the GUI thread)
+    and asks the image plugin for a scaled decode, so a multi-megabyte
+    JPEG is never expanded at full size. Results are kept in memory and as
+    PNGs keyed by the media file's content hash, so re-previews and later
+    runs skip decoding the original entirely.
     """
-    parsed = urlparse(url)
-    base   = parsed.path.split("/")[-1] or "file.bin"
-    # strip query / fragment
-    base   = base.split("?", 1)[0].split("#", 1)[0]
-    suffix = os.path.splitext(base)[1] or ".bin"
-
-    fd, tmp_path = tempfile.mkstemp(suffix=suffix)
-    os.close(fd)
-    with urllib.request.urlopen(url) as resp, open(tmp_path, "wb") as out:
-        out.write(resp.read())
-    return tmp_path
-
-# ----------------------------------------------------------------------
-# helper: pull the 32-char page-ID from any Notion URL
-# ----------------------------------------------------------------------
-_PAGE_ID_RE = re.compile(r"[0-9a-fA-F]{32}")
-def extract_page_id(url: str) -> str | None:
-    tail = urlparse(url).path.split("/")[-1]
-    tail = tail.split("?", 1)[0].split("#", 1)[0]
-    if "-" in tail:
-        tail = tail.split("-")[-1]
-    m = _PAGE_ID_RE.fullmatch(tail)
-    return m.group(0) if m else None
-
-async def fetch_notion_content(token: str, page_url: str):
-    """
-    Return (plain-text, image_path) for the given Notion page.
-    The first image is downloaded via _download_temp_file().
-    """
-    page_id = extract_page_id(page_url)
-    if not page_id:
-        raise ValueError("Couldn’t parse a Notion page ID from that link 🤔")
-
-    nc = Client(auth=token)
-    txt_parts, img_local = [], None
-
-    for blk in nc.blocks.children.list(page_id)["results"]:
-        kind = blk["type"]
-
-        if kind in ("paragraph", "heading_1", "heading_2", "heading_3"):
-            rich = blk[kind]["rich_text"]
-            if rich:
-                txt_parts.append(rich[0]["plain_text"])
-
-        if kind == "image" and img_local is None:
-            src = (blk["image"]["file"]["url"]
-                   if blk["image"]["type"] == "file"
-                   else blk["image"]["external"]["url"])
-            img_local = _download_temp_file(src)
-
-    return "\n".join(txt_parts).strip(), img_local
-
+    def __init__(self, root: str, workers: int = 2):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="thumb")
+        self.mem: OrderedDict[str, QtGui.QImage] = OrderedDict()
+        self.pending: dict[str, asyncio.Future] = {}    # src → decode in flight
+
+    def _path(self, src: str) -> str:
+        return os.path.join(
+            self.root, os.path.splitext(os.path.basename(src))[0] + ".png")
+
+    def _decode(self, src: str) -> QtGui.QImage:
+        """Worker thread: the stored thumbnail, or a fresh scaled decode."""
+        dst = self._path(src)
+        img = QtGui.QImage(dst)
+        if not img.isNull():
+            return img
+        reader = QtGui.QImageReader(src); reader.setAutoTransform(True)
+        size = reader.size()
+        if size.isValid() and max(size.width(), size.height()) > THUMB_MAX_SIDE:
+            reader.setScaledSize(size.scaled(
+                THUMB_MAX_SIDE, THUMB_MAX_SIDE,
+                QtCore.Qt.AspectRatioMode.KeepAspectRatio))
+        img = reader.read()
+        if img.isNull():
+            raise ValueError(f"Can’t decode {os.path.basename(src)}: "
+                             f"{reader.errorString()}")
+        if img.save(dst + ".tmp", "PNG"):
+            os.replace(dst + ".tmp", dst)
+        return img
+
+    async def get(self, src: str) -> QtGui.QImage:
+        if src in self.mem:
+            self.mem.move_to_end(src); return self.mem[src]
+        # a second request for the same image joins the running decode
+        # instead of racing it for the same thumbnail file
+        fut = self.pending.get(src)
+        if fut is None:
+            fut = self.pending[src] = asyncio.get_running_loop().run_in_executor(
+                self.pool, self._decode, src)
+            fut.add_done_callback(lambda _: self.pending.pop(src, None))
+        with metrics().span("preview.decode"):
+            img = await asyncio.shield(fut)
+        self.mem[src] = img
+        while len(self.mem) > THUMB_MEMORY: self.mem.popitem(last=False)
+        return img
+
+    def prune(self, media_root: str) -> None:
+        """Drop thumbnails whose original left the media cache."""
+        alive = {os.path.splitext(n)[0] for n in os.listdir(media_root)}
+        for name in os.listdir(self.root):
+            if os.path.splitext(name)[0] not in alive:
+                try: os.remove(os.path.join(self.root, name))
+                except OSError: pass
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+# ─────────────────────── progress panel ───────────────────────
+class ProgressPanel(QtWidgets.QDockWidget):
+    """Live counters and throughput of the running broadcast(s)."""
+    ROWS = ("Stage", "Sent", "Failed", "Retried", "Uploaded", "Throughput")
+
+    def __init__(self, parent=None):
+        super().__init__("Broadcast progress", parent)
+        box = QtWidgets.QWidget(); form = QtWidgets.QFormLayout(box)
+        self.labels = {r: QtWidgets.QLabel("–") for r in self.ROWS}
+        for r in self.ROWS: form.addRow(r + ":", self.labels[r])
+        self.setWidget(box)
+        self.active, self.started, self.stopped = 0, None, None
+        self.totals, self.stage = {}, ""
+        metrics().listeners.append(self.on_event)
+        # repaint a few times a second instead of once per event
+        self.timer = QtCore.QTimer(self); self.timer.setInterval(250)
+        self.timer.timeout.connect(self.refresh)
+
+    def begin(self):
+        if not self.active:
+            self.totals, self.stage = {}, ""
+            self.started, self.stopped = time.monotonic(), None
+            self.timer.start()
+        self.active += 1
+
+    def end(self):
+        self.active -= 1
+        if not self.active:
+            self.stopped, self.stage = time.monotonic(), "done"
+            self.timer.stop(); self.refresh()
+
+    def on_event(self, ev):
+        if not self.active: return
+        if "counter" in ev:
+            key = (ev["counter"], ev.get("platform", ""))
+            self.totals[key] = self.totals.get(key, 0) + ev["n"]
+        elif "span" in ev and not ev["span"].endswith(".send"):
+            self.stage = ev["span"]
+
+    def _per_platform(self, name, fmt=str):
+        parts = [f"{p.title() or 'All'} {fmt(v)}"
+                 for (n, p), v in sorted(self.totals.items()) if n == name]
+        return ", ".join(parts) or "0"
+
+    def refresh(self):
+        sent = sum(v for (n, _), v in self.totals.items() if n == "sent")
+        elapsed = (self.stopped or time.monotonic()) - (self.started or 0)
+        self.labels["Stage"].setText(self.stage or "…")
+        self.labels["Sent"].setText(self._per_platform("sent"))
+        self.labels["Failed"].setText(self._per_platform("failed"))
+        self.labels["Retried"].setText(self._per_platform("retried"))
+        self.labels["Uploaded"].setText(
+            self._per_platform("bytes_uploaded", lambda b: f"{b / 2**20:.1f} MB"))
+        self.labels["Throughput"].setText(
+            f"{sent / elapsed:.1f} msg/s ({elapsed:.0f} s)" if elapsed > 0 else "–")
 
 # ─────────────────────────── GUI class ───────────────────────────
 class App(QtWidgets.QMainWindow):
@@ -95,35 +158,87 @@ class App(QtWidgets.QMainWindow):
         self.ui.pushButton.clicked.connect(self.send_message_telegram)
         self.ui.pushButton_2.clicked.connect(self.send_message_slack)
 
+        # ░░ credentials from the environment / .env (as in fetcher.py) ░░
+        for field, var in ((self.ui.telegramApiIdInput, "TELEGRAM_API_ID"),
+                           (self.ui.telegramApiHashInput, "TELEGRAM_API_HASH"),
+                           (self.ui.slackBotTokenInput, "SLACK_BOT_TOKEN"),
+                           (self.ui.notionApiTokenInput, "NOTION_TOKEN")):
+            if not field.text(): field.setText(os.getenv(var, "").strip())
+        self.ui.telegramApiIdInput.editingFinished.connect(self.warm_up)
+        self.ui.telegramApiHashInput.editingFinished.connect(self.warm_up)
+
         # ░░ notion tag / mode ░░
         self.ui.useNotionCheckbox.stateChanged.connect(self.toggle_notion_mode)
         self.ui.notionApiTokenInput.setEnabled(True)
         self.ui.notionTagSelector.setEnabled(False)
         self.ui.notionApiTokenInput.editingFinished.connect(
-            self.load_notion_tags)
+            lambda: asyncio.create_task(self.load_notion_tags()))
+        notion_menu = self.ui.menubar.addMenu("Notion")
+        notion_menu.addAction("Clear cached Notion data",
+                              self.invalidate_notion_cache)
+        bc_menu = self.ui.menubar.addMenu("Broadcast")
+        self.resumeAction = bc_menu.addAction(
+            "Resume unfinished broadcast (skip delivered recipients)")
+        self.resumeAction.setCheckable(True)
+        bc_menu.addAction("Import Telegram group export…", self.import_group_export)
+        bc_menu.addAction("Forget cached Telegram groups", self.invalidate_dialogs)
+        bc_menu.addAction("Add Telegram account…",
+                          lambda: asyncio.create_task(self.add_tg_account()))
+
+        # ░░ live progress ░░
+        self.progress = ProgressPanel(self)
+        self.addDockWidget(QtCore.Qt.DockWidgetArea.BottomDockWidgetArea,
+                           self.progress)
+        bc_menu.addAction(self.progress.toggleViewAction())
 
         # runtime holders
-        self.cachedText: str = ""
-        self.imagePath: str | None = None
+        self.content: PageContent | None = None
+        self.thumbs = ThumbnailCache(
+            os.path.join(os.path.dirname(media_cache().root), "thumbs"))
+        self._preview_pix: QtGui.QPixmap | None = None
+        # rescale the (small) thumbnail whenever the preview label resizes
+        self.ui.imagePreviewLabel.installEventFilter(self)
         self._tg_lock = asyncio.Lock()
-        self.tg_client = None
+        self.broadcaster = Broadcaster(ask=self.async_get_text)
 
     # ───────────── tag selector ─────────────
-    def load_notion_tags(self):
+    async def load_notion_tags(self):
         token = self.ui.notionApiTokenInput.text().strip()
         if not token:
             return
         try:
-            db = Client(auth=token).databases.retrieve(
-                database_id=NOTION_DATABASE_ID)
+            tags = await fetch_notion_tags(token)
             self.ui.notionTagSelector.clear()
-            for opt in db["properties"]["Category"]["multi_select"]["options"]:
-                it = QtWidgets.QListWidgetItem(opt["name"])
+            for name in tags:
+                it = QtWidgets.QListWidgetItem(name)
                 it.setFlags(it.flags() | QtCore.Qt.ItemFlag.ItemIsUserCheckable)
                 it.setCheckState(QtCore.Qt.CheckState.Unchecked)
                 self.ui.notionTagSelector.addItem(it)
         except Exception as e:
-            print("[TagLoad]", e)
+            metrics().error("notion.tags", e)
+            self.ui.statusbar.showMessage(f"Couldn’t load Notion tags: {e}", 5000)
+
+    def invalidate_notion_cache(self):
+        notion_cache().invalidate()
+        self.content = None
+        self.ui.statusbar.showMessage("Notion cache cleared", 3000)
+
+    def import_group_export(self):
+        """Seed the group-name index from a fetcher.py export."""
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Import group export", "",
+            "Group exports (*.jsonl *.csv);;All files (*)")
+        if not path: return
+        try:
+            added = self.broadcaster.dialog_index.seed(read_group_export(path))
+        except (OSError, ValueError, KeyError) as e:
+            QtWidgets.QMessageBox.critical(self, "Import error", str(e)); return
+        self.ui.statusbar.showMessage(f"{added} groups added to the index", 5000)
+
+    def invalidate_dialogs(self):
+        """Rescan dialogs on the next send, e.g. after a group was renamed."""
+        self.broadcaster.invalidate_dialogs()
+        self.ui.statusbar.showMessage("Telegram group index cleared", 3000)
 
     def toggle_notion_mode(self):
         """Checkbox only affects where channels/groups come from and
@@ -147,25 +262,47 @@ class App(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(
                 self, "Missing URL", "Paste a Notion page link first."); return
         try:
-            txt, img = await fetch_notion_content(token, url)
+            content = await fetch_notion_content(token, url)
         except Exception as exc:
+            metrics().error("notion.page", exc)
             QtWidgets.QMessageBox.critical(
                 self, "Fetch error", str(exc)); return
 
-        self.cachedText, self.imagePath = txt, img
-        self.ui.previewPlainText.setPlainText(txt or "[No text]")
-        if img:
-            pix = QtGui.QPixmap(img).scaled(
-                self.ui.imagePreviewLabel.size(),
-                QtCore.Qt.AspectRatioMode.KeepAspectRatio,
-                QtCore.Qt.TransformationMode.SmoothTransformation)
-            self.ui.imagePreviewLabel.setPixmap(pix)
-        else:
-            self.ui.imagePreviewLabel.clear()
-
-    async def prepare_content(self):
-        if self.cachedText or self.imagePath:
-            return self.cachedText, self.imagePath
+        self.content = content
+        self.ui.previewPlainText.setPlainText(content.text or "[No text]")
+        self._preview_pix = None
+        self.ui.imagePreviewLabel.clear()
+        if not content.images:
+            return
+        try:
+            img = await self.thumbs.get(content.images[0])
+        except Exception as exc:
+            metrics().error("preview.decode", exc)
+            self.ui.statusbar.showMessage(str(exc), 5000); return
+        if self.content is not content:
+            return                  # a newer preview started meanwhile
+        self._preview_pix = QtGui.QPixmap.fromImage(img)
+        self._show_preview()
+
+    def _show_preview(self):
+        if self._preview_pix is None: return
+        label = self.ui.imagePreviewLabel
+        dpr = label.devicePixelRatioF()
+        pix = self._preview_pix.scaled(
+            label.size() * dpr, QtCore.Qt.AspectRatioMode.KeepAspectRatio,
+            QtCore.Qt.TransformationMode.SmoothTransformation)
+        pix.setDevicePixelRatio(dpr)
+        label.setPixmap(pix)
+
+    def eventFilter(self, obj, event):
+        if obj is self.ui.imagePreviewLabel and \
+                event.type() == QtCore.QEvent.Type.Resize:
+            self._show_preview()
+        return super().eventFilter(obj, event)
+
+    async def prepare_content(self) -> PageContent:
+        if self.content:
+            return self.content
         url   = self.ui.notionPageUrlInput.text().strip()
         token = self.ui.notionApiTokenInput.text().strip()
         return await fetch_notion_content(token, url)
@@ -179,34 +316,28 @@ class App(QtWidgets.QMainWindow):
                                         dlg.deleteLater()))
         dlg.show(); return await fut
 
-    async def get_tg_client(self):
-        if self.tg_client: return self.tg_client
-        api_id  = self.ui.telegramApiIdInput.text().strip()
-        api_hash= self.ui.telegramApiHashInput.text().strip()
-        if not api_id or not api_hash:
-            raise ValueError("Telegram API credentials missing.")
-        sesdir = os.path.join(os.path.expanduser("~"), ".TelegramSlackApp")
-        os.makedirs(sesdir, exist_ok=True)
-        client = TelegramClient(
-            os.path.join(sesdir, "my_account.session"), api_id, api_hash)
-        await client.connect()
-        client._update_loop_running = client._keepalive_loop_running = False
-        if not await client.is_user_authorized():
-            phone = await self.async_get_text("Phone (with country code):")
-            if not phone: raise Exception("Phone required!")
-            await client.send_code_request(phone); await asyncio.sleep(1)
-            code = await self.async_get_text("Login code:")
-            try:     await client.sign_in(phone, code)
-            except SessionPasswordNeededError:
-                pw = await self.async_get_text("Password:")
-                await client.sign_in(password=pw)
-        self.tg_client = client; return client
-
-    async def get_group_ids(self, cli, names):
-        ids = []
-        async for d in cli.iter_dialogs():
-            if d.is_group and d.name in names: ids.append(d.id)
-        return ids
+    def warm_up(self):
+        """Connect Telegram in the background as soon as credentials are known."""
+        self.broadcaster.warm_up(*self._tg_credentials())
+
+    def _tg_credentials(self):
+        return (self.ui.telegramApiIdInput.text().strip(),
+                self.ui.telegramApiHashInput.text().strip())
+
+    async def get_tg_pool(self):
+        return await self.broadcaster.get_tg_pool(*self._tg_credentials())
+
+    async def add_tg_account(self):
+        """Log an extra Telegram account into the send pool."""
+        async with self._tg_lock:
+            name = await self.async_get_text(
+                "Name for the extra Telegram account (letters, digits, - or _):")
+            if not name: return
+            try:
+                await self.broadcaster.add_tg_account(*self._tg_credentials(), name)
+            except Exception as e:
+                QtWidgets.QMessageBox.critical(self,"Error",str(e)); return
+            self.ui.statusbar.showMessage(f"Telegram account {name} added", 5000)
 
     def _selected_tags(self):
         return [self.ui.notionTagSelector.item(i).text()
@@ -214,95 +345,81 @@ class App(QtWidgets.QMainWindow):
                 if self.ui.notionTagSelector.item(i).checkState()
                    == QtCore.Qt.CheckState.Checked]
 
-    def get_telegram_groups_by_tags(self, tok, tags):
-        cli=Client(auth=tok); groups=[]
-        filt=[{"property":"Category","multi_select":{"contains":t}} for t in tags]
-        res=cli.databases.query(database_id=NOTION_DATABASE_ID,
-              filter={"and":[{"property":"Platform","select":{"equals":"Telegram"}},{"or":filt}]})
-        for r in res["results"]:
-            rt=r["properties"]["Contact Name / Channel ID"]["rich_text"]
-            if rt: groups.append(rt[0]["plain_text"])
-        return groups
+    def _target_pages(self, platform, manual_input):
+        """Prefetched target batches: Notion tags or the manual text box."""
+        notion = self.ui.useNotionCheckbox.isChecked()
+        return Prefetch(target_pages(
+            platform, manual_input.toPlainText().split("\n"),
+            self.ui.notionApiTokenInput.text().strip() if notion else "",
+            self._selected_tags()))
+
+    def _report(self, title, ok, bad, skipped):
+        if skipped:
+            self.ui.statusbar.showMessage(
+                f"Skipped {skipped} recipients already delivered", 5000)
+        if ok:  QtWidgets.QMessageBox.information(self,title,", ".join(ok))
+        if bad: QtWidgets.QMessageBox.critical(self,"Errors","\n".join(bad))
 
     async def send_message_telegram_async(self):
         async with self._tg_lock:
             self.ui.pushButton.setEnabled(False)
+            # target pages start loading now, alongside the page content
+            group_pages = self._target_pages("Telegram", self.ui.telegramGroupsInput)
+            self.progress.begin()
             try:
-                txt, img = await self.prepare_content()
-            except Exception as e:
-                QtWidgets.QMessageBox.critical(self,"Error",str(e)); return
-            if not txt and not img:
-                QtWidgets.QMessageBox.warning(self,"Empty","Nothing to send."); return
-
-            client = await self.get_tg_client()
-            ch_manual = self.ui.telegramChannelsInput.toPlainText().strip().split("\n")
-            if self.ui.useNotionCheckbox.isChecked():
-                grps = self.get_telegram_groups_by_tags(
-                    self.ui.notionApiTokenInput.text().strip(), self._selected_tags())
-            else:
-                grps = self.ui.telegramGroupsInput.toPlainText().strip().split("\n")
-
-            ids = await self.get_group_ids(client, grps)
-            recipients = [r.strip() if isinstance(r,str) else r
-                          for r in (ch_manual + ids)
-                          if (r if isinstance(r,int) else r.strip())]
-
-            ok, bad = [], []
-            for r in recipients:
-                try:
-                    if img: await client.send_file(r, img, caption=txt or None)
-                    else:   await client.send_message(r, txt)
-                    ok.append(str(r))
-                except Exception as e:
-                    bad.append(f"{r}: {e}")
-
-            if ok:  QtWidgets.QMessageBox.information(self,"Telegram",", ".join(ok))
-            if bad: QtWidgets.QMessageBox.critical(self,"Errors","\n".join(bad))
-            self.ui.pushButton.setEnabled(True)
+                await self._send_telegram(group_pages)
+            finally:
+                group_pages.close()
+                self.progress.end()
+                self.ui.pushButton.setEnabled(True)
+
+    async def _send_telegram(self, group_pages):
+        try:
+            content = await self.prepare_content()
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(self,"Error",str(e)); return
+        if not content:
+            QtWidgets.QMessageBox.warning(self,"Empty","Nothing to send."); return
+
+        channels = self.ui.telegramChannelsInput.toPlainText().split("\n")
+        try:
+            pool = await self.get_tg_pool()
+            result = await self.broadcaster.send_telegram(
+                pool, content, channels, group_pages,
+                resume=self.resumeAction.isChecked())
+        except Exception as e:
+            metrics().error("telegram.broadcast", e)
+            QtWidgets.QMessageBox.critical(self,"Error",str(e)); return
+        self._report("Telegram", *result)
 
     def send_message_telegram(self):
         asyncio.create_task(self.send_message_telegram_async())
 
     # ───────────── Slack routines ─────────────
-    def get_slack_channels_by_tags(self, tok, tags):
-        cli=Client(auth=tok); chans=[]
-        filt=[{"property":"Category","multi_select":{"contains":t}} for t in tags]
-        res=cli.databases.query(database_id=NOTION_DATABASE_ID,
-              filter={"and":[{"property":"Platform","select":{"equals":"Slack"}},{"or":filt}]})
-        for r in res["results"]:
-            rt=r["properties"]["Contact Name / Channel ID"]["rich_text"]
-            if rt: chans.append(rt[0]["plain_text"])
-        return chans
-
     async def _send_slack(self):
-        try: txt, img = await self.prepare_content()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self,"Error",str(e)); return
         token = self.ui.slackBotTokenInput.text().strip()
         if not token:
             QtWidgets.QMessageBox.critical(self,"Missing","Slack bot token"); return
+        chans = self._target_pages("Slack", self.ui.slackChannelsInput)
+        self.progress.begin()
+        try:
+            await self._send_slack_to(token, chans)
+        finally:
+            chans.close()
+            self.progress.end()
 
-        chans = (self.get_slack_channels_by_tags(
-                    self.ui.notionApiTokenInput.text().strip(),
-                    self._selected_tags())
-                 if self.ui.useNotionCheckbox.isChecked()
-                 else self.ui.slackChannelsInput.toPlainText().strip().split("\n"))
-
-        cli = WebClient(token=token)
-        ok, bad = [], []
-        for c in chans:
-            try:
-                if img:
-                    cli.files_upload(channels=c, file=img,
-                                     title=txt or "Image", initial_comment=txt or "")
-                else:
-                    cli.chat_postMessage(channel=c, text=txt)
-                ok.append(c)
-            except SlackApiError as e:
-                bad.append(f"{c}: {e.response['error']}")
-
-        if ok:  QtWidgets.QMessageBox.information(self,"Slack",", ".join(ok))
-        if bad: QtWidgets.QMessageBox.critical(self,"Errors","\n".join(bad))
+    async def _send_slack_to(self, token, chans):
+        try:
+            content = await self.prepare_content()
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(self,"Error",str(e)); return
+        try:
+            result = await self.broadcaster.send_slack(
+                token, content, chans, resume=self.resumeAction.isChecked())
+        except Exception as e:
+            metrics().error("slack.broadcast", e)
+            QtWidgets.QMessageBox.critical(self,"Error",slack_error(e)); return
+        self._report("Slack", *result)
 
     def send_message_slack(self):
         asyncio.run_coroutine_threadsafe(self._send_slack(),
@@ -311,7 +428,15 @@ class App(QtWidgets.QMainWindow):
 
 # ───────────────────────── main ─────────────────────────
 if __name__ == "__main__":
+    load_dotenv()
     qtapp = QtWidgets.QApplication([])
     loop = qasync.QEventLoop(qtapp); asyncio.set_event_loop(loop)
     window = App(); window.show()
-    with loop: loop.run_forever()
+    QtCore.QTimer.singleShot(0, window.warm_up)     # once the loop is running
+    with loop:
+        loop.run_forever()
+        # pooled Slack session, Telegram clients, Notion clients
+        loop.run_until_complete(window.broadcaster.close())
+    window.thumbs.close()
+    media_cache().prune()
+    window.thumbs.prune(media_cache().root)
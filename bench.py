@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# Offline broadcast benchmark: local Notion / Slack stand-ins + a fake Telegram
+# client, driving the real broadcast.py pipeline. Never touches real services.
+#
+#   python bench.py --recipients 300 --latency 40 --error-rate 0.02
+#   python bench.py --json > bench.json      # machine-readable, for diffing
+#   python bench.py --startup                # GUI cold start vs. STARTUP_TARGET_MS
+#   python bench.py --accounts 3 --rate 10 --error-rate 0.05 --flood 60   # account pool
+#
+# Telegram speaks MTProto rather than HTTP, so it is stood in for by an
+# in-process object exposing the TelegramClient coroutines the pipeline uses.
+import os, sys, json, time, random, asyncio, argparse, tempfile, subprocess
+from types import SimpleNamespace
+from aiohttp import web
+
+# isolate every on-disk cache/journal from the real ~/.TelegramSlackApp
+_HOME = tempfile.mkdtemp(prefix="tsbench-")
+os.environ["HOME"] = os.environ["USERPROFILE"] = _HOME
+
+import broadcast
+from broadcast import (Broadcaster, SendScheduler, target_pages,
+                       fetch_notion_content, fetch_notion_targets,
+                       notion_cache, TG_MAX_CONCURRENCY)
+from telethon import types as tl_types
+from telethon.errors import FloodWaitError, RpcCallFailError
+
+TOKEN   = "bench-token"
+PAGE_ID = "0" * 31 + "1"
+PAGE_URL = f"https://www.notion.so/Bench-{PAGE_ID}"
+EDITED  = "2025-01-01T00:00:00.000Z"
+PNG     = bytes.fromhex("89504e470d0a1a0a") + os.urandom(64 * 1024)
+
+STARTUP_TARGET_MS = 400     # process spawn → main window shown (p50)
+LAZY_SDKS = ("telethon", "slack_sdk", "notion_client", "aiohttp")
+
+# what app.py's __main__ does up to the first painted window
+_STARTUP_PROBE = """
+import sys, json, asyncio
+from PyQt6 import QtWidgets
+import qasync
+qtapp = QtWidgets.QApplication([])
+loop = qasync.QEventLoop(qtapp); asyncio.set_event_loop(loop)
+import app
+window = app.App(); window.show(); qtapp.processEvents()
+print(json.dumps(sorted(m for m in %r if m in sys.modules)), flush=True)
+""" % (LAZY_SDKS,)
+
+# ----------------------------------------------------------------------
+# helpers
+# ----------------------------------------------------------------------
+def _pct(samples, q: float) -> float:
+    """q-th percentile (0–100) of *samples*, nearest-rank."""
+    if not samples: return 0.0
+    s = sorted(samples)
+    return s[max(0, min(len(s) - 1, round(q / 100 * len(s) + 0.5) - 1))]
+
+class TimedScheduler(SendScheduler):
+    """SendScheduler that records every run() duration, retries included."""
+    def __init__(self, rates):
+        super().__init__(rates)
+        self.samples: dict[str, list[float]] = {}
+
+    async def run(self, platform, call, *args):
+        t = time.perf_counter()
+        try:
+            return await super().run(platform, call, *args)
+        finally:
+            # pooled accounts ("telegram:x") count towards their platform
+            self.samples.setdefault(platform.partition(":")[0], []).append(
+                time.perf_counter() - t)
+
+class Faults:
+    def __init__(self, latency_ms: float, error_rate: float):
+        self.latency, self.error_rate = latency_ms / 1000, error_rate
+
+    async def rtt(self):
+        # ±25 % jitter so percentiles mean something
+        await asyncio.sleep(self.latency * random.uniform(0.75, 1.25))
+
+    def fail(self) -> bool:
+        return random.random() < self.error_rate
+
+# ----------------------------------------------------------------------
+# Notion + Slack stand-in (one aiohttp app, two route prefixes)
+# ----------------------------------------------------------------------
+def _rich(text, **ann):
+    return [{"plain_text": text, "annotations": ann, "href": None}]
+
+def _block(bid, kind, children=False, **body):
+    return {"id": bid, "type": kind, "has_children": children,
+            "last_edited_time": EDITED, kind: body}
+
+def build_fake_services(n: int, images: int, faults: Faults):
+    """URLs handed back to the client are built from the request's Host."""
+    rows = {p: [f"{p}-{i}" for i in range(n)] for p in ("Telegram", "Slack")}
+    children = {PAGE_ID: [
+        _block("h1", "heading_1", rich_text=_rich("Benchmark announcement")),
+        *[_block(f"p{i}", "paragraph", rich_text=_rich(f"Paragraph {i} ", bold=i % 2 == 0))
+          for i in range(5)],
+        _block("t1", "toggle", children=True, rich_text=_rich("Details")),
+        *[_block(f"img{i}", "image", type="external",
+                 external={"url": f"/img/{i}.png"}) for i in range(images)],
+    ], "t1": [_block(f"li{i}", "bulleted_list_item", rich_text=_rich(f"item {i}"))
+              for i in range(3)]}
+    counters = {"slack_files": 0}
+
+    def page(results, start, size=100):
+        return {"results": results[start:start + size],
+                "has_more": start + size < len(results),
+                "next_cursor": str(start + size) if start + size < len(results) else None}
+
+    async def notion_db(request):
+        await faults.rtt()
+        return web.json_response({"properties": {"Category": {"multi_select": {
+            "options": [{"name": "Bench"}]}}}})
+
+    async def notion_query(request):
+        await faults.rtt()
+        body = await request.json()
+        if "sorts" in body:                       # NotionCache validation probe
+            return web.json_response({"results": [{"last_edited_time": EDITED}],
+                                      "has_more": False})
+        platform = body["filter"]["and"][0]["select"]["equals"]
+        results = [{"last_edited_time": EDITED, "properties": {
+            "Contact Name / Channel ID": {"rich_text": _rich(name)}}}
+            for name in rows[platform]]
+        return web.json_response(page(results, int(body.get("start_cursor") or 0),
+                                      body.get("page_size", 100)))
+
+    async def notion_children(request):
+        await faults.rtt()
+        base = f"http://{request.host}"
+        blocks = [b if b["type"] != "image" else
+                  {**b, "image": {"type": "external",
+                                  "external": {"url": base + b["image"]["external"]["url"]}}}
+                  for b in children.get(request.match_info["bid"], [])]
+        return web.json_response(page(blocks, int(request.query.get("start_cursor", 0))))
+
+    async def notion_page(request):
+        await faults.rtt()
+        return web.json_response({"id": PAGE_ID, "last_edited_time": EDITED})
+
+    async def image(request):
+        await faults.rtt()
+        return web.Response(body=PNG, content_type="image/png")
+
+    async def slack(request):
+        await faults.rtt()
+        method, base = request.match_info["method"], f"http://{request.host}"
+        if method == "chat.postMessage" and faults.fail():
+            return web.json_response({"ok": False, "error": "ratelimited"},
+                                     status=429, headers={"Retry-After": "0"})
+        if method == "files.getUploadURLExternal":
+            counters["slack_files"] += 1
+            fid = f"F{counters['slack_files']}"
+            return web.json_response({"ok": True, "file_id": fid,
+                                      "upload_url": f"{base}/upload/{fid}"})
+        if method == "files.completeUploadExternal":
+            body = (await request.json() if request.content_type == "application/json"
+                    else {**request.query, **await request.post()})
+            files = body["files"]
+            files = json.loads(files) if isinstance(files, str) else files
+            return web.json_response({"ok": True, "files": [
+                {"id": f["id"], "permalink": f"{base}/files/{f['id']}"} for f in files]})
+        return web.json_response({"ok": True, "ts": f"{time.time():.6f}"})
+
+    async def slack_upload(request):
+        await request.read(); await faults.rtt()
+        return web.Response(text="OK")
+
+    app = web.Application(client_max_size=64 * 2**20)
+    app.add_routes([
+        web.get("/v1/databases/{db}", notion_db),
+        web.post("/v1/databases/{db}/query", notion_query),
+        web.get("/v1/blocks/{bid}/children", notion_children),
+        web.get("/v1/pages/{pid}", notion_page),
+        web.get("/img/{name}", image),
+        web.post("/api/{method}", slack),
+        web.post("/upload/{fid}", slack_upload),
+    ])
+    return app
+
+# ----------------------------------------------------------------------
+# Telegram stand-in
+# ----------------------------------------------------------------------
+class FakeTelegram:
+    """
+    The TelegramClient coroutines broadcast.py calls, with fake RTTs. An
+    injected FloodWait lasts *flood* seconds, during which every send from
+    this account is refused, as Telegram does.
+    """
+    def __init__(self, groups, faults: Faults, flood: float = 0):
+        self.groups, self.faults, self.flood = groups, faults, flood
+        self.flooded_until = 0.0
+        self.sent = 0
+
+    async def iter_dialogs(self):
+        for i, name in enumerate(self.groups):
+            if i % 100 == 0: await self.faults.rtt()      # one API page
+            yield SimpleNamespace(is_group=True, name=name,
+                                  id=-(10**12 + i + 1),
+                                  entity=SimpleNamespace(access_hash=i + 1))
+
+    async def get_input_entity(self, peer):
+        await self.faults.rtt()
+        return tl_types.InputPeerChannel(-int(peer) - 10**12, 1)
+
+    async def upload_file(self, path):
+        await self.faults.rtt()
+        return tl_types.InputFile(random.getrandbits(62), 1,
+                                  os.path.basename(path), "")
+
+    async def __call__(self, request):                    # UploadMediaRequest
+        await self.faults.rtt()
+        return tl_types.MessageMediaPhoto(photo=tl_types.Photo(
+            random.getrandbits(62), 1, b"", None, [], 2))
+
+    async def _send(self):
+        await self.faults.rtt()
+        left = self.flooded_until - time.monotonic()
+        if left > 0:
+            raise FloodWaitError(None, capture=int(left) + 1)
+        if self.faults.fail():
+            if random.random() < 0.5:
+                raise RpcCallFailError(None)
+            self.flooded_until = time.monotonic() + self.flood
+            raise FloodWaitError(None, capture=int(self.flood))
+        self.sent += 1
+
+    async def send_file(self, peer, file, **kwargs):
+        await self._send()
+
+    async def send_message(self, peer, text, **kwargs):
+        await self._send()
+
+    async def disconnect(self):
+        pass
+
+# ----------------------------------------------------------------------
+# stages
+# ----------------------------------------------------------------------
+async def _timed(coro_factory, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        t = time.perf_counter(); await coro_factory()
+        samples.append(time.perf_counter() - t)
+    return samples
+
+async def run_bench(args) -> list[dict]:
+    faults = Faults(args.latency, args.error_rate)
+    runner = web.AppRunner(build_fake_services(args.recipients, args.images, faults))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0); await site.start()
+    host, port = site._server.sockets[0].getsockname()[:2]
+    base = f"http://{host}:{port}"
+    broadcast.NOTION_API_URL, broadcast.SLACK_API_URL = base, base + "/api/"
+
+    rates = {p: (args.rate, max(1, int(args.rate))) for p in ("telegram", "slack")}
+    results = []
+
+    def report(stage, samples, messages=0, wall=None):
+        wall = wall if wall is not None else sum(samples)
+        results.append({"stage": stage, "n": len(samples),
+                        "p50_ms": round(_pct(samples, 50) * 1000, 2),
+                        "p99_ms": round(_pct(samples, 99) * 1000, 2),
+                        "msgs_per_s": round(messages / wall, 1) if messages and wall else None})
+
+    bc = Broadcaster(ask=None)
+    bc.scheduler = TimedScheduler(rates)
+    try:
+        # Notion page: cold (cache dropped each time) vs. warm (TTL hit)
+        async def cold():
+            notion_cache().invalidate()
+            return await fetch_notion_content(TOKEN, PAGE_URL)
+        report("notion fetch (cold)", await _timed(cold, args.iterations))
+        report("notion fetch (cached)", await _timed(
+            lambda: fetch_notion_content(TOKEN, PAGE_URL), args.iterations))
+        content = await fetch_notion_content(TOKEN, PAGE_URL)
+
+        # target resolution: Notion rows → dialog index → InputPeers, all cold
+        tg = FakeTelegram([f"Telegram-{i}" for i in range(args.recipients)], faults)
+        async def resolve():
+            notion_cache().invalidate(); bc.dialog_index.invalidate()
+            bc.peer_cache.entries.clear()
+            names = await fetch_notion_targets(TOKEN, "Telegram", ["Bench"])
+            ids = await bc.get_group_ids(tg, names)
+            await bc.peer_cache.resolve(tg, ids, bc.scheduler, TG_MAX_CONCURRENCY)
+        report("target resolution (cold)", await _timed(resolve, args.iterations))
+
+        # Telegram broadcast (targets from Notion, warm peer cache), spread
+        # over --accounts sessions that are all members of every group
+        tg.flood = args.flood
+        pool = [bc.account("main", tg)] + [
+            bc.account(f"bench{i}", FakeTelegram(tg.groups, faults, args.flood))
+            for i in range(1, args.accounts)]
+        bc.scheduler = TimedScheduler(rates)
+        t = time.perf_counter()
+        ok, bad, _ = await bc.send_telegram(
+            pool, content, [], target_pages("Telegram", (), TOKEN, ["Bench"]))
+        wall = time.perf_counter() - t
+        report("telegram request", bc.scheduler.samples.get("telegram", []),
+               len(ok), wall)
+        results[-1].update(ok=len(ok), bad=len(bad),
+                           retries=bc.scheduler.retries, wall_s=round(wall, 3))
+
+        # Slack broadcast
+        bc.scheduler = TimedScheduler(rates)
+        t = time.perf_counter()
+        ok, bad, _ = await bc.send_slack(
+            TOKEN, content, target_pages("Slack", (), TOKEN, ["Bench"]))
+        wall = time.perf_counter() - t
+        report("slack request", bc.scheduler.samples.get("slack", []),
+               len(ok), wall)
+        results[-1].update(ok=len(ok), bad=len(bad),
+                           retries=bc.scheduler.retries, wall_s=round(wall, 3))
+    finally:
+        await bc.close()
+        await runner.cleanup()
+    return results
+
+def run_startup(iterations: int) -> list[dict]:
+    """Cold-start the GUI *iterations* times in fresh interpreters."""
+    env = {**os.environ, "QT_QPA_PLATFORM": os.environ.get("QT_QPA_PLATFORM", "offscreen")}
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples, loaded = [], []
+    for _ in range(iterations):
+        t = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE], cwd=here, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(time.perf_counter() - t)
+        loaded = json.loads(out.strip().splitlines()[-1])
+    p50 = _pct(samples, 50) * 1000
+    return [{"stage": "gui startup", "n": len(samples), "p50_ms": round(p50, 2),
+             "p99_ms": round(_pct(samples, 99) * 1000, 2), "msgs_per_s": None,
+             "target_ms": STARTUP_TARGET_MS, "within_target": p50 <= STARTUP_TARGET_MS,
+             "sdks_loaded": ",".join(loaded) or "none"}]
+
+def _print_table(results) -> None:
+    print(f"{'stage':<26}{'n':>6}{'p50 ms':>10}{'p99 ms':>10}{'msg/s':>9}   details")
+    for r in results:
+        extra = "  ".join(f"{k}={r[k]}" for k in ("ok", "bad", "retries", "wall_s",
+                                                  "target_ms", "within_target",
+                                                  "sdks_loaded") if k in r)
+        mps = "" if r["msgs_per_s"] is None else r["msgs_per_s"]
+        print(f"{r['stage']:<26}{r['n']:>6}{r['p50_ms']:>10}{r['p99_ms']:>10}{mps:>9}   {extra}")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__ or "Offline broadcast benchmark")
+    ap.add_argument("--recipients", type=int, default=300,
+                    help="Telegram groups and Slack channels each (default 300)")
+    ap.add_argument("--images", type=int, default=1, help="images on the page")
+    ap.add_argument("--latency", type=float, default=30,
+                    help="simulated round-trip per request, ms (default 30)")
+    ap.add_argument("--error-rate", type=float, default=0.0,
+                    help="fraction of sends answered with a rate-limit/transient error")
+    ap.add_argument("--rate", type=float, default=1e6,
+                    help="scheduler requests/second per platform (default: unthrottled)")
+    ap.add_argument("--iterations", type=int, default=5,
+                    help="repetitions of the Notion/resolution stages")
+    ap.add_argument("--accounts", type=int, default=1,
+                    help="Telegram accounts in the send pool (default 1)")
+    ap.add_argument("--flood", type=float, default=0,
+                    help="seconds an injected Telegram FloodWait lasts (default 0)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--startup", action="store_true",
+                    help="measure GUI cold start instead; exit 1 if over target")
+    ap.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = ap.parse_args(argv)
+
+    random.seed(args.seed)
+    if args.startup:
+        results = run_startup(args.iterations)
+    else:
+        results = asyncio.run(run_bench(args))
+    if args.json:
+        print(json.dumps({"args": vars(args), "results": results}, indent=2))
+    else:
+        _print_table(results)
+    return 0 if all(r.get("within_target", True) for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
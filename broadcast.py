@@ -0,0 +1,1573 @@
+# Notion → Telegram/Slack broadcast pipeline, shared by the GUI (app.py)
+# and the headless CLI/daemon (headless.py). Must never import Qt.
+#
+# The platform SDKs (Telethon, slack_sdk, notion_client, aiohttp) are
+# imported inside the functions that need them, so importing this module –
+# and starting the GUI – costs almost nothing until a platform is used.
+import re, os, sys, csv, json, time, uuid, random, sqlite3, hashlib, asyncio, tempfile, threading
+import importlib
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import NamedTuple, TYPE_CHECKING
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    import aiohttp
+    from telethon import TelegramClient
+    from slack_sdk.web.async_client import AsyncWebClient
+    from notion_client import AsyncClient
+
+# ────────────────────────── constants ──────────────────────────
+NOTION_DATABASE_ID = "1d001a3f59f881c09cf2fc79f57ac4ac"
+NOTION_API_URL = "https://api.notion.com"   # overridable, e.g. by bench.py
+SLACK_API_URL = "https://slack.com/api/"
+TG_MAX_CONCURRENCY = 8      # parallel Telegram sends per broadcast
+SLACK_MAX_CONCURRENCY = 8   # parallel Slack posts per broadcast
+TG_CAPTION_LIMIT = 1024     # longer texts go out as a message before the media
+TG_TEXT_LIMIT = 4096        # longer texts are split over several messages
+NOTION_CACHE_TTL = 300      # seconds a cached Notion answer is used unchecked
+NOTION_TARGETS_MAX_AGE = 1800   # target lists are refetched at least this often
+NOTION_MAX_CONCURRENCY = 3  # parallel block-children requests per page
+MEDIA_MAX_BYTES = 50 * 2**20        # refuse single downloads above this
+MEDIA_CACHE_MAX_BYTES = 500 * 2**20 # LRU-evict the media cache beyond this
+SEND_RATES = {              # platform → (requests/second, burst)
+    "telegram": (10, 10),
+    "slack":    (10, 20),
+}
+SEND_MAX_ATTEMPTS = 4       # tries per request before it lands in "bad"
+SEND_MAX_WAIT = 300         # retry-after hints longer than this aren't waited out
+TG_FAILOVER_WAIT = 10       # a pooled account flood-limited longer hands recipients on
+DIALOG_MISSING_TTL = 3600   # a group name no full scan found isn't looked for again sooner
+
+# ----------------------------------------------------------------------
+# metrics: per-stage timing spans and counters
+# ----------------------------------------------------------------------
+class Metrics:
+    """
+    Process-wide timings and counters. Time a stage with
+    ``with metrics().span("notion.blocks"): ...`` and count with
+    ``metrics().count("sent", platform="slack")``. Every event is appended
+    as one JSON line to *log* ("-" = stderr) when set, and handed to each
+    callable in *listeners* (e.g. the GUI progress panel). Only use from
+    the event-loop thread.
+    """
+    PREFIX = "broadcast"
+
+    def __init__(self, log: str | None = None):
+        self.log = log
+        self.listeners: list = []
+        self.counters: dict[tuple, float] = {}      # (name, labels) → total
+        self.timings: dict[str, list] = {}          # stage → [count, sum_s, max_s]
+
+    def _emit(self, event: dict) -> None:
+        event = {"ts": round(time.time(), 3), **event}
+        if self.log:
+            line = json.dumps(event, ensure_ascii=False) + "\n"
+            if self.log == "-":
+                sys.stderr.write(line)
+            else:
+                with open(self.log, "a", encoding="utf-8") as f: f.write(line)
+        for fn in list(self.listeners):
+            try: fn(event)
+            except Exception: pass          # a broken listener must not stop a send
+
+    def count(self, name: str, n: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + n
+        self._emit({"counter": name, "n": n, **labels})
+
+    def error(self, stage: str, exc: Exception) -> None:
+        """Count and log an error that is otherwise only shown to the user."""
+        key = ("errors", (("stage", stage),))
+        self.counters[key] = self.counters.get(key, 0) + 1
+        self._emit({"counter": "errors", "n": 1, "stage": stage, "error": str(exc)})
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        t, failed = time.perf_counter(), None
+        try:
+            yield
+        except BaseException as e:
+            failed = type(e).__name__; raise
+        finally:
+            dt = time.perf_counter() - t
+            st = self.timings.setdefault(stage, [0, 0.0, 0.0])
+            st[0] += 1; st[1] += dt; st[2] = max(st[2], dt)
+            self._emit({"span": stage, "seconds": round(dt, 6), **labels,
+                        **({"error": failed} if failed else {})})
+
+    def prometheus(self) -> str:
+        """Current totals in the Prometheus text exposition format."""
+        def lbl(pairs):
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+        p, out = self.PREFIX, []
+        for name in sorted({n for n, _ in self.counters}):
+            out.append(f"# TYPE {p}_{name}_total counter")
+            out += [f"{p}_{name}_total{lbl(labels)} {v:g}"
+                    for (n, labels), v in sorted(self.counters.items()) if n == name]
+        if self.timings:
+            out.append(f"# TYPE {p}_stage_seconds summary")
+            for stage, (n, total, _) in sorted(self.timings.items()):
+                out.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {n}')
+                out.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            out.append(f"# TYPE {p}_stage_seconds_max gauge")
+            out += [f'{p}_stage_seconds_max{{stage="{stage}"}} {mx:.6f}'
+                    for stage, (_, _, mx) in sorted(self.timings.items())]
+        return "\n".join(out) + "\n"
+
+_metrics_obj = Metrics()
+
+def metrics() -> Metrics:
+    return _metrics_obj
+
+# ----------------------------------------------------------------------
+# media cache: streamed, content-addressed, LRU-evicted downloads
+# ----------------------------------------------------------------------
+class MediaCache:
+    """
+    Downloads land in ~/.TelegramSlackApp/media named by their SHA-256, so
+    identical files are stored once. index.json maps a caller key (URL or
+    a stable block key) to that file, so a repeat preview skips the
+    download entirely. Least-recently-used files go once the directory
+    exceeds *max_total* bytes. Safe to call from several threads at once.
+    """
+    CHUNK = 64 * 1024
+
+    def __init__(self, root: str, max_file: int = MEDIA_MAX_BYTES,
+                 max_total: int = MEDIA_CACHE_MAX_BYTES):
+        self.root, self.max_file, self.max_total = root, max_file, max_total
+        self.index_path = os.path.join(root, "index.json")
+        os.makedirs(root, exist_ok=True)
+        self.lock = threading.Lock()    # guards index, index.json and eviction
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index: dict[str, str] = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def fetch(self, url: str, key: str | None = None) -> str:
+        """Return a local path for *url*, downloading it only on a cache miss."""
+        key = key or url
+        with self.lock:
+            name = self.index.get(key)
+            if name:
+                path = os.path.join(self.root, name)
+                try:
+                    os.utime(path)          # mark as recently used
+                    return path
+                except FileNotFoundError:
+                    pass
+
+        base   = urlparse(url).path.split("/")[-1] or "file.bin"
+        suffix = os.path.splitext(base)[1][:16] or ".bin"
+        fd, part = tempfile.mkstemp(dir=self.root, suffix=".part")
+        digest, size = hashlib.sha256(), 0
+        try:
+            import urllib.request
+            with urllib.request.urlopen(url) as resp, os.fdopen(fd, "wb") as out:
+                while chunk := resp.read(self.CHUNK):
+                    size += len(chunk)
+                    if size > self.max_file:
+                        raise ValueError(
+                            f"File larger than {self.max_file // 2**20} MB: {base}")
+                    digest.update(chunk); out.write(chunk)
+            name = digest.hexdigest() + suffix
+            os.replace(part, os.path.join(self.root, name))
+        except BaseException:
+            try: os.remove(part)
+            except OSError: pass
+            raise
+
+        with self.lock:
+            self.index[key] = name
+            _write_json_atomic(self.index_path, self.index)
+            self._prune(partials=False)
+        return os.path.join(self.root, name)
+
+    def prune(self, partials: bool = True) -> None:
+        """
+        Evict LRU files over the cap; with *partials* (only safe when no
+        download is running, e.g. on exit) also drop unfinished downloads.
+        """
+        with self.lock:
+            self._prune(partials)
+
+    def _prune(self, partials: bool) -> None:
+        files = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith((".part", ".tmp")):
+                if partials:
+                    try: os.remove(path)
+                    except OSError: pass
+            elif name != "index.json":
+                try: st = os.stat(path)
+                except FileNotFoundError: continue     # removed mid-scan
+                files.append((st.st_mtime, st.st_size, name))
+        total = sum(sz for _, sz, _ in files)
+        gone = set()
+        for _, sz, name in sorted(files):
+            if total <= self.max_total: break
+            try: os.remove(os.path.join(self.root, name))
+            except OSError: continue
+            total -= sz; gone.add(name)
+        if gone:
+            self.index = {k: v for k, v in self.index.items() if v not in gone}
+            _write_json_atomic(self.index_path, self.index)
+
+_media_cache_obj: MediaCache | None = None
+
+def media_cache() -> MediaCache:
+    global _media_cache_obj
+    if _media_cache_obj is None:
+        _media_cache_obj = MediaCache(os.path.join(_app_dir(), "media"))
+    return _media_cache_obj
+
+# ----------------------------------------------------------------------
+# helper: start consuming an async iterator in the background
+# ----------------------------------------------------------------------
+class Prefetch:
+    """
+    Begin pulling *agen* right away (up to *depth* items ahead) and iterate
+    the same items later. Lets a target list load while the page content
+    is fetched and while the first targets are already being sent.
+    Call close() when done so an abandoned source stops loading.
+    """
+    _END = object()
+
+    def __init__(self, agen, depth: int = 4):
+        self._q: asyncio.Queue = asyncio.Queue(depth)
+        self._task = asyncio.create_task(self._pump(agen))
+
+    async def _pump(self, agen):
+        try:
+            async for x in agen:
+                await self._q.put((x, None))
+            await self._q.put((self._END, None))
+        except Exception as e:
+            await self._q.put((None, e))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        x, err = await self._q.get()
+        if err is not None: raise err
+        if x is self._END: raise StopAsyncIteration
+        return x
+
+    def close(self) -> None:
+        self._task.cancel()
+
+async def _failed(label, exc):
+    return label, exc
+
+# ----------------------------------------------------------------------
+# rate-limited, retrying send scheduler shared by Telegram and Slack
+# ----------------------------------------------------------------------
+class TokenBucket:
+    """*rate* requests/second with bursts of *burst*; pause() halts everyone."""
+    def __init__(self, rate: float, burst: int):
+        self.rate, self.burst = rate, burst
+        self._tokens, self._last = float(burst), time.monotonic()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def take(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now); continue
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1; return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+def _is_slack_error(e: Exception) -> bool:
+    # slack_sdk is imported lazily; if it isn't loaded, e can't be from it
+    errors = sys.modules.get("slack_sdk.errors")
+    return errors is not None and isinstance(e, errors.SlackApiError)
+
+def _telegram_retry(e: Exception):
+    """(wait_seconds | None for backoff, pause_whole_account) or None = give up."""
+    from telethon.errors import (FloodWaitError, FloodPremiumWaitError,
+                                 SlowModeWaitError, ServerError, TimedOutError)
+    if isinstance(e, (FloodWaitError, FloodPremiumWaitError)):
+        return e.seconds, True
+    if isinstance(e, SlowModeWaitError):            # per chat, not per account
+        return e.seconds, False
+    if isinstance(e, (ServerError, TimedOutError, ConnectionError,
+                      asyncio.TimeoutError)):
+        return None, False
+    return None
+
+def _telegram_failover(e: Exception) -> bool:
+    """Errors tied to the sending account: another account may still succeed."""
+    from telethon.errors import (FloodWaitError, FloodPremiumWaitError, PeerFloodError,
+                                 ChatWriteForbiddenError, ChannelPrivateError,
+                                 UserBannedInChannelError, ChatRestrictedError)
+    return isinstance(e, (FloodWaitError, FloodPremiumWaitError, PeerFloodError,
+                          ChatWriteForbiddenError, ChannelPrivateError,
+                          UserBannedInChannelError, ChatRestrictedError))
+
+def _slack_retry(e: Exception):
+    import aiohttp
+    if _is_slack_error(e):
+        status = e.response.status_code
+        # non-JSON bodies (HTML error pages from the edge) arrive as plain str
+        error = e.response.data.get("error") if isinstance(e.response.data, dict) else None
+        if status == 429 or error == "ratelimited":
+            return float(e.response.headers.get("Retry-After", 1)), True
+        if status >= 500 or error in ("internal_error", "service_unavailable",
+                                      "request_timeout"):
+            return None, False
+        return None
+    if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+        return None, False
+    return None
+
+class SendScheduler:
+    """
+    Every platform call goes through run(): it waits for a token from the
+    platform's bucket, honours retry-after hints (FloodWait, Slack 429) by
+    pausing that platform, and retries transient failures with jittered
+    exponential backoff. Non-retryable errors are raised unchanged.
+
+    *platform* may name one account, e.g. "telegram:work": it then gets its
+    own bucket (at the platform's rate), so one account's FloodWait leaves
+    the others running.
+    """
+    CLASSIFY = {"telegram": _telegram_retry, "slack": _slack_retry}
+
+    def __init__(self, rates=None):
+        self.rates = rates or SEND_RATES
+        self.buckets = {p: TokenBucket(*r) for p, r in self.rates.items()}
+        self.flooded: dict[str, float] = {}     # key → monotonic end of last flood wait
+        self.retries = 0
+
+    def _bucket(self, key: str) -> TokenBucket:
+        if key not in self.buckets:
+            self.buckets[key] = TokenBucket(*self.rates[key.partition(":")[0]])
+        return self.buckets[key]
+
+    def paused_for(self, key: str) -> float:
+        """Seconds until *key* is expected to accept requests again."""
+        return max(0.0, self.flooded.get(key, 0.0) - time.monotonic())
+
+    async def run(self, platform: str, call, max_wait: float = SEND_MAX_WAIT):
+        """
+        Await call() (a zero-arg coroutine factory) under *platform*'s
+        limits. Retry-after hints longer than *max_wait* are raised.
+        """
+        base, _, account = platform.partition(":")
+        bucket, classify = self._bucket(platform), self.CLASSIFY[base]
+        labels = {"platform": base, **({"account": account} if account else {})}
+        for attempt in range(1, SEND_MAX_ATTEMPTS + 1):
+            await bucket.take()
+            try:
+                return await call()
+            except Exception as e:
+                verdict = classify(e)
+                if verdict is None or attempt == SEND_MAX_ATTEMPTS:
+                    raise
+                wait, everyone = verdict
+                hinted = wait is not None
+                if not hinted:
+                    wait = min(30, 2 ** (attempt - 1)) * (0.5 + random.random())
+                if everyone:
+                    if hinted:
+                        self.flooded[platform] = max(self.flooded.get(platform, 0.0),
+                                                     time.monotonic() + wait)
+                    # hold the whole bucket off, even if this call gives up
+                    if wait <= SEND_MAX_WAIT: bucket.pause(wait)
+                if hinted and wait > max_wait:
+                    raise
+                self.retries += 1
+                metrics().count("retried", **labels)
+                if not everyone:
+                    await asyncio.sleep(wait)
+
+async def _sit_out_floods(call, max_wait: float = SEND_MAX_WAIT):
+    """
+    Await call() (a zero-arg coroutine factory), sleeping through Telegram
+    FloodWaits of up to *max_wait*. For the calls that don't go through
+    SendScheduler: clients use flood_sleep_threshold=0, so Telethon no
+    longer does this for them.
+    """
+    from telethon.errors import FloodWaitError
+    for attempt in range(1, SEND_MAX_ATTEMPTS + 1):
+        try:
+            return await call()
+        except FloodWaitError as e:
+            if attempt == SEND_MAX_ATTEMPTS or e.seconds > max_wait:
+                raise
+            metrics().count("retried", platform="telegram")
+            await asyncio.sleep(e.seconds)
+
+# ----------------------------------------------------------------------
+# helper: run one coroutine per recipient with a bounded concurrency
+# ----------------------------------------------------------------------
+async def _fan_out(targets, send, limit: int, describe=str):
+    """
+    Await send(target) for every target, at most *limit* in flight (no
+    bound with limit=None, for a *send* that limits itself).
+    Returns (ok, bad) in the original target order, same shape the
+    result dialogs expect: ok = ["target"], bad = ["target: error"].
+    *describe* turns a caught exception into the text after the colon.
+
+    *targets* may also be an async iterable: sends start as soon as each
+    target arrives, while the source keeps loading the rest.
+    """
+    sem = asyncio.Semaphore(max(1, limit)) if limit is not None else nullcontext()
+
+    async def one(t):
+        async with sem:
+            try:
+                await send(t)
+                return str(t), None
+            except Exception as e:
+                return str(t), e
+
+    if hasattr(targets, "__aiter__"):
+        tasks = []
+        try:
+            async for t in targets:
+                tasks.append(asyncio.create_task(one(t)))
+        except Exception as e:
+            # keep what was already dispatched, report the broken source
+            tasks.append(asyncio.create_task(_failed("(target list)", e)))
+        results = await asyncio.gather(*tasks)
+    else:
+        results = await asyncio.gather(*(one(t) for t in targets))
+    ok  = [t for t, e in results if e is None]
+    bad = [f"{t}: {describe(e)}" for t, e in results if e is not None]
+    return ok, bad
+
+def slack_error(e: Exception) -> str:
+    """Slack's short error code (e.g. 'channel_not_found') when available."""
+    if _is_slack_error(e) and isinstance(e.response.data, dict):
+        return e.response.data.get("error", str(e))
+    return str(e)
+
+# ----------------------------------------------------------------------
+# helper: per-user state directory (Telegram session, caches)
+# ----------------------------------------------------------------------
+def _app_dir() -> str:
+    path = os.path.join(os.path.expanduser("~"), ".TelegramSlackApp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _write_json_atomic(path: str, data) -> None:
+    """Write *data* as JSON via a temp file + rename so readers never see half a file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+# ----------------------------------------------------------------------
+# persistent Telegram group-name → peer index
+# ----------------------------------------------------------------------
+GROUP_EXPORT_FIELDS = ("id", "name", "access_hash", "first_seen", "last_seen")
+
+def read_group_export(path: str) -> list[dict]:
+    """Rows of a fetcher.py export (.jsonl or .csv), ids as ints."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    for r in rows:
+        r["id"] = int(r["id"])
+        r["access_hash"] = int(r["access_hash"]) if r.get("access_hash") not in (None, "") else None
+    return rows
+
+class DialogIndex:
+    """
+    Group name → [{"id", "access_hash"}, …] map stored next to the session,
+    so name lookups are a dict hit and iter_dialogs() only runs for names
+    it has never seen. Several groups may share a name; each of them gets
+    the message. Names a full scan didn't find are remembered as missing
+    for DIALOG_MISSING_TTL, so a stale target doesn't rescan every time.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if not isinstance(data.get("version"), int):    # plain name → entry map
+            data = {"groups": {n: e if isinstance(e, list) else [e]
+                               for n, e in data.items()}}
+        self.entries: dict[str, list] = data.get("groups", {})
+        self.missing: dict[str, float] = data.get("missing", {})   # name → when
+        self.scanned: float | None = data.get("scanned")   # last full scan
+        self._names = {e["id"]: n for n, es in self.entries.items() for e in es}
+
+    @property
+    def complete(self) -> bool:
+        """Every dialog has been scanned at least once."""
+        return self.scanned is not None
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __getitem__(self, name):
+        return self.entries[name]
+
+    def _drop(self, gid: int) -> None:
+        name = self._names.pop(gid, None)
+        if name is None: return
+        self.entries[name] = [e for e in self.entries[name] if e["id"] != gid]
+        if not self.entries[name]: del self.entries[name]
+
+    def _put(self, name: str, gid: int, access_hash) -> None:
+        if self._names.get(gid) != name:        # new, or renamed since indexed
+            self._drop(gid)
+        same = self.entries.setdefault(name, [])
+        same[:] = [e for e in same if e["id"] != gid]
+        same.append({"id": gid, "access_hash": access_hash})
+        self._names[gid] = name
+        self.missing.pop(name, None)
+
+    def add(self, dialog) -> None:
+        self._put(dialog.name, dialog.id, getattr(dialog.entity, "access_hash", None))
+
+    def save(self) -> None:
+        _write_json_atomic(self.path, {"version": 2, "groups": self.entries,
+                                       "missing": self.missing, "scanned": self.scanned})
+
+    def needs_scan(self, names) -> bool:
+        """True if a name is neither indexed nor recently found missing."""
+        now = time.time()
+        return any(n not in self.entries
+                   and now - self.missing.get(n, float("-inf")) >= DIALOG_MISSING_TTL
+                   for n in names)
+
+    def seed(self, rows) -> int:
+        """
+        Add groups from a fetcher.py export (see read_group_export) without
+        overwriting groups already learned from a live scan. Returns how
+        many were new.
+        """
+        added = 0
+        for r in rows:
+            if r["id"] not in self._names:
+                self._put(r["name"], r["id"], r["access_hash"])
+                added += 1
+        if added: self.save()
+        return added
+
+    def invalidate(self) -> None:
+        """Forget everything; the next lookup does a full dialog scan."""
+        self.entries, self.missing, self.scanned, self._names = {}, {}, None, {}
+        try: os.remove(self.path)
+        except FileNotFoundError: pass
+
+    async def refresh(self, cli, wanted=()) -> None:
+        """
+        Scan dialogs newest first and record every group seen. After the
+        first full scan, stop as soon as all *wanted* names are known.
+        A scan that reaches the end drops groups no longer listed (left)
+        and remembers the *wanted* names it didn't find as missing.
+        """
+        missing = {n for n in wanted if n not in self.entries}
+        seen = set()
+
+        async def scan() -> bool:
+            async for d in cli.iter_dialogs():
+                if not d.is_group: continue
+                self.add(d); seen.add(d.id); missing.discard(d.name)
+                if self.complete and wanted and not missing: return False
+            return True
+
+        with metrics().span("telegram.dialogs"):
+            # GetDialogs floods on big accounts; a retry starts over, add() is idempotent
+            full = await _sit_out_floods(scan)
+        if full:
+            for gid in set(self._names) - seen: self._drop(gid)
+            self.scanned = time.time()
+            self.missing.update(dict.fromkeys(missing, self.scanned))
+        self.save()
+
+# ----------------------------------------------------------------------
+# persistent recipient → InputPeer cache
+# ----------------------------------------------------------------------
+class PeerCache:
+    """
+    Recipient string/ID → marked peer ID + access hash, stored next to the
+    session. resolve() turns a recipient list into ready InputPeers so
+    send_file()/send_message() never have to resolve usernames themselves.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.entries: dict[str, dict] = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def _to_peer(e: dict):
+        from telethon import types as tl_types, utils as tl_utils
+        real_id, kind = tl_utils.resolve_id(e["peer_id"])
+        if kind is tl_types.PeerUser:
+            return tl_types.InputPeerUser(real_id, e["access_hash"])
+        if kind is tl_types.PeerChannel:
+            return tl_types.InputPeerChannel(real_id, e["access_hash"])
+        return tl_types.InputPeerChat(real_id)
+
+    def remember(self, key: str, peer) -> None:
+        from telethon import types as tl_types, utils as tl_utils
+        if isinstance(peer, (tl_types.InputPeerUser, tl_types.InputPeerChannel,
+                             tl_types.InputPeerChat)):
+            self.entries[key] = {"peer_id": tl_utils.get_peer_id(peer),
+                                 "access_hash": getattr(peer, "access_hash", None)}
+
+    def learn(self, key: str, peer_id: int, access_hash) -> None:
+        """
+        Record a peer known from elsewhere (the group index, possibly seeded
+        from an export), so it resolves even if the session never saw it.
+        """
+        from telethon import types as tl_types, utils as tl_utils
+        if key in self.entries: return
+        _, kind = tl_utils.resolve_id(peer_id)
+        if kind is tl_types.PeerChat or access_hash is not None:
+            self.entries[key] = {"peer_id": peer_id, "access_hash": access_hash}
+
+    def forget(self, key: str) -> None:
+        self.entries.pop(key, None)
+
+    def save(self) -> None:
+        _write_json_atomic(self.path, self.entries)
+
+    async def resolve(self, cli, recipients, scheduler, limit: int, seen=None,
+                      platform: str = "telegram"):
+        """
+        Return ({label: InputPeer}, ["label: error"]). Cache hits cost
+        nothing; misses are resolved concurrently in one pass. Recipients
+        that land on an already-listed peer are dropped as duplicates;
+        pass the same *seen* set across calls to dedupe between batches.
+        Lookups are scheduled under *platform* (an account key, if pooled).
+        """
+        labels = list(dict.fromkeys(str(r) for r in recipients))
+        peers = {k: self._to_peer(self.entries[k])
+                 for k in labels if k in self.entries}
+        raw = {str(r): r for r in recipients}
+
+        async def lookup(k):
+            peers[k] = await scheduler.run(
+                platform, lambda: cli.get_input_entity(raw[k]))
+            self.remember(k, peers[k])
+
+        misses, bad = [k for k in labels if k not in peers], []
+        if misses:
+            with metrics().span("telegram.resolve", peers=len(misses)):
+                _, bad = await _fan_out(misses, lookup, limit)
+            self.save()
+
+        out, seen = {}, (set() if seen is None else seen)
+        for k in labels:
+            if k not in peers: continue
+            pid = self.entries[k]["peer_id"] if k in self.entries else k
+            if pid in seen: continue
+            seen.add(pid); out[k] = peers[k]
+        return out, bad
+
+# ----------------------------------------------------------------------
+# crash-safe delivery journal (SQLite next to the session)
+# ----------------------------------------------------------------------
+class DeliveryJournal:
+    """
+    Append-only log of every delivery attempt, keyed by broadcast ID and
+    recipient label. Each row is committed as soon as the send returns, so
+    after a crash a resumed broadcast only visits recipients still pending.
+    """
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id TEXT PRIMARY KEY, platform TEXT, digest TEXT,
+                started REAL, finished REAL);
+            CREATE TABLE IF NOT EXISTS deliveries (
+                broadcast_id TEXT, recipient TEXT, status TEXT,
+                at REAL, error TEXT);
+            CREATE INDEX IF NOT EXISTS deliveries_by_broadcast
+                ON deliveries (broadcast_id, status);
+        """)
+
+    @staticmethod
+    def digest(content) -> str:
+        """Identify a message by its text and (content-addressed) image names."""
+        names = "\0".join(os.path.basename(i) for i in content.images)
+        return hashlib.sha256(f"{content.text}\0{names}".encode()).hexdigest()
+
+    def begin(self, platform: str, digest: str, resume: bool) -> str:
+        """
+        Return the broadcast ID to use: with *resume*, the newest unfinished
+        broadcast of the same message on *platform*; otherwise a new one.
+        """
+        if resume:
+            row = self.db.execute(
+                "SELECT id FROM broadcasts WHERE platform=? AND digest=? "
+                "AND finished IS NULL ORDER BY started DESC LIMIT 1",
+                (platform, digest)).fetchone()
+            if row: return row[0]
+        bid = uuid.uuid4().hex
+        with self.db:
+            self.db.execute("INSERT INTO broadcasts VALUES (?,?,?,?,NULL)",
+                            (bid, platform, digest, time.time()))
+        return bid
+
+    def delivered(self, bid: str) -> set[str]:
+        return {r for (r,) in self.db.execute(
+            "SELECT recipient FROM deliveries WHERE broadcast_id=? AND status='sent'",
+            (bid,))}
+
+    def record(self, bid: str, recipient: str, error: str | None = None) -> None:
+        with self.db:
+            self.db.execute("INSERT INTO deliveries VALUES (?,?,?,?,?)",
+                            (bid, recipient, "failed" if error else "sent",
+                             time.time(), error))
+
+    def finish(self, bid: str) -> None:
+        with self.db:
+            self.db.execute("UPDATE broadcasts SET finished=? WHERE id=?",
+                            (time.time(), bid))
+
+# ----------------------------------------------------------------------
+# helper: pull the 32-char page-ID from any Notion URL
+# ----------------------------------------------------------------------
+_PAGE_ID_RE = re.compile(r"[0-9a-fA-F]{32}")
+def extract_page_id(url: str) -> str | None:
+    tail = urlparse(url).path.split("/")[-1]
+    tail = tail.split("?", 1)[0].split("#", 1)[0]
+    if "-" in tail:
+        tail = tail.split("-")[-1]
+    m = _PAGE_ID_RE.fullmatch(tail)
+    return m.group(0) if m else None
+
+# ----------------------------------------------------------------------
+# Notion: one pooled async client per token, shared by every query
+# ----------------------------------------------------------------------
+_notion_clients: dict[str, "AsyncClient"] = {}
+
+def _notion(token: str) -> "AsyncClient":
+    if token not in _notion_clients:
+        from notion_client import AsyncClient
+        _notion_clients[token] = AsyncClient(auth=token, base_url=NOTION_API_URL)
+    return _notion_clients[token]
+
+# ----------------------------------------------------------------------
+# Notion: on-disk response cache (TTL + last_edited_time validation)
+# ----------------------------------------------------------------------
+class NotionCache:
+    """
+    One JSON file per (token, key) under ~/.TelegramSlackApp/notion_cache.
+    Entries younger than *ttl* are served without touching Notion; older
+    ones are re-validated with a single last_edited_time probe and only
+    refetched when the source actually changed.
+    """
+    def __init__(self, root: str, ttl: float = NOTION_CACHE_TTL):
+        self.root, self.ttl = root, ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, token: str, key: str) -> str:
+        digest = hashlib.sha1(f"{token}\0{key}".encode()).hexdigest()
+        return os.path.join(self.root, digest + ".json")
+
+    def store(self, token, key, value, stamp=None, expires=None, stored=None) -> None:
+        """
+        *expires*: hard deadline (epoch) after which the value is unusable.
+        *stored*: when the value was fetched, if earlier than now.
+        """
+        now = time.time()
+        _write_json_atomic(self._path(token, key), {
+            "stored": stored or now, "checked": now, "stamp": stamp,
+            "expires": expires, "value": value})
+
+    async def lookup(self, token, key, edited=None, max_age=None):
+        """
+        Return (value, stamp): value is None on a miss; stamp is the
+        source's current last_edited_time (from awaiting *edited()*), to be
+        passed back to store() with the refetched value. A value fetched
+        more than *max_age* seconds ago is refetched even if the stamp
+        still matches (for changes the stamp can't show).
+        """
+        try:
+            with open(self._path(token, key), encoding="utf-8") as f:
+                e = json.load(f)
+        except (OSError, ValueError):
+            e = None
+        now = time.time()
+        if e and e["expires"] is not None and now >= e["expires"]:
+            e = None
+        if e and max_age is not None and now - e["stored"] >= max_age:
+            e = None
+        if e and now - e.get("checked", e["stored"]) < self.ttl:
+            return e["value"], e["stamp"]
+        stamp = await edited() if edited else None
+        if e and stamp is not None and stamp == e["stamp"]:
+            self.store(token, key, e["value"], stamp, e["expires"], e["stored"])
+            return e["value"], stamp
+        return None, stamp
+
+    def invalidate(self) -> None:
+        """Drop every cached Notion answer."""
+        for name in os.listdir(self.root):
+            try: os.remove(os.path.join(self.root, name))
+            except OSError: pass
+
+_notion_cache_obj: NotionCache | None = None
+
+def notion_cache() -> NotionCache:
+    global _notion_cache_obj
+    if _notion_cache_obj is None:
+        _notion_cache_obj = NotionCache(os.path.join(_app_dir(), "notion_cache"))
+    return _notion_cache_obj
+
+async def _db_last_edited(token: str) -> str:
+    """
+    Newest last_edited_time of any row in the contacts database. Deleting
+    or archiving a row doesn't change it, hence NOTION_TARGETS_MAX_AGE.
+    """
+    res = await _notion(token).databases.query(
+        database_id=NOTION_DATABASE_ID, page_size=1,
+        sorts=[{"timestamp": "last_edited_time", "direction": "descending"}])
+    return res["results"][0]["last_edited_time"] if res["results"] else ""
+
+async def fetch_notion_tags(token: str) -> list[str]:
+    key = f"tags:{NOTION_DATABASE_ID}"
+    tags, _ = await notion_cache().lookup(token, key)
+    if tags is None:
+        db = await _notion(token).databases.retrieve(database_id=NOTION_DATABASE_ID)
+        tags = [o["name"] for o in db["properties"]["Category"]["multi_select"]["options"]]
+        notion_cache().store(token, key, tags)
+    return tags
+
+async def _paginate(stage: str, method, **kwargs):
+    """
+    Yield the "results" of every page of a cursor-paginated Notion
+    endpoint; each request is timed as *stage*.
+    """
+    cursor = None
+    while True:
+        if cursor: kwargs["start_cursor"] = cursor
+        with metrics().span(stage):
+            res = await method(**kwargs)
+        yield res["results"]
+        if not res.get("has_more"): return
+        cursor = res["next_cursor"]
+
+async def iter_notion_targets(token: str, platform: str, tags):
+    """
+    Yield, one Notion page (≤100 rows) at a time, the 'Contact Name /
+    Channel ID' of every *platform* row tagged with any of *tags*.
+    A valid cached answer is yielded as a single batch.
+    """
+    key = f"targets:{NOTION_DATABASE_ID}:{platform}:{json.dumps(sorted(tags))}"
+    cached, stamp = await notion_cache().lookup(
+        token, key, lambda: _db_last_edited(token), NOTION_TARGETS_MAX_AGE)
+    if cached is not None:
+        yield cached; return
+
+    found = []
+    filt = [{"property":"Category","multi_select":{"contains":t}} for t in tags]
+    async for rows in _paginate(
+            "notion.targets", _notion(token).databases.query,
+            database_id=NOTION_DATABASE_ID,
+            filter={"and":[{"property":"Platform","select":{"equals":platform}},{"or":filt}]}):
+        out = []
+        for r in rows:
+            rt = r["properties"]["Contact Name / Channel ID"]["rich_text"]
+            if rt: out.append(rt[0]["plain_text"])
+        found += out
+        yield out
+    notion_cache().store(token, key, found, stamp)
+
+async def fetch_notion_targets(token: str, platform: str, tags) -> list[str]:
+    return [t async for page in iter_notion_targets(token, platform, tags)
+            for t in page]
+
+async def iter_notion_blocks(token: str, block_id: str):
+    """Yield every child block of *block_id*, following pagination."""
+    async for blocks in _paginate("notion.blocks",
+                                  _notion(token).blocks.children.list,
+                                  block_id=block_id):
+        for blk in blocks:
+            yield blk
+
+def _walk(blocks):
+    """Every block of a fetched tree, depth first."""
+    for b in blocks:
+        yield b
+        yield from _walk(b.get("children", ()))
+
+def _file_url_expiry(blocks) -> float | None:
+    """Earliest expiry of the signed Notion-hosted file URLs in *blocks*."""
+    # Python 3.10's fromisoformat() doesn't accept Notion's trailing "Z"
+    times = [datetime.fromisoformat(
+                 b[b["type"]]["file"]["expiry_time"].replace("Z", "+00:00")).timestamp()
+             for b in _walk(blocks)
+             if b["type"] in ("image", "file") and b[b["type"]]["type"] == "file"]
+    return min(times, default=None)
+
+async def _fetch_tree(token: str, block_id: str, sem: asyncio.Semaphore):
+    """
+    Children of *block_id* with their own children nested under
+    "children". Sibling subtrees load concurrently; *sem* bounds how many
+    list calls are in flight (it is not held while recursing).
+    """
+    async with sem:
+        blocks = [b async for b in iter_notion_blocks(token, block_id)]
+    nested = [b for b in blocks if b.get("has_children")
+              and b["type"] not in ("child_page", "child_database")]
+    subtrees = await asyncio.gather(
+        *(_fetch_tree(token, b["id"], sem) for b in nested))
+    for b, kids in zip(nested, subtrees):
+        b["children"] = kids
+    return blocks
+
+async def fetch_notion_blocks(token: str, page_id: str) -> list[dict]:
+    """The page's whole block tree, served from the cache while unchanged."""
+    key = f"tree:{page_id}"
+
+    async def edited():
+        return (await _notion(token).pages.retrieve(page_id))["last_edited_time"]
+
+    blocks, stamp = await notion_cache().lookup(token, key, edited)
+    if blocks is None:
+        blocks = await _fetch_tree(
+            token, page_id, asyncio.Semaphore(NOTION_MAX_CONCURRENCY))
+        notion_cache().store(token, key, blocks, stamp, _file_url_expiry(blocks))
+    return blocks
+
+# ----------------------------------------------------------------------
+# Notion page → plain text, Telegram HTML and Slack mrkdwn
+# ----------------------------------------------------------------------
+class PageContent(NamedTuple):
+    text: str           # plain text, for the preview pane
+    telegram: str       # Telegram HTML (parse_mode="html")
+    slack: str          # Slack mrkdwn
+    images: list[str]   # local paths, in page order
+
+    def __bool__(self):
+        return bool(self.text or self.images)
+
+def _esc_html(s: str) -> str:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _span(span: dict, fmt: str) -> str:
+    text = span["plain_text"]
+    if fmt == "plain" or not text:
+        return text
+    ann, href = span.get("annotations", {}), span.get("href")
+    if fmt == "telegram":
+        out = _esc_html(text)
+        for key, tag in (("code", "code"), ("bold", "b"), ("italic", "i"),
+                         ("strikethrough", "s"), ("underline", "u")):
+            if ann.get(key): out = f"<{tag}>{out}</{tag}>"
+        if href:
+            attr = _esc_html(href).replace('"', "&quot;")
+            out = f'<a href="{attr}">{out}</a>'
+        return out
+    if "\n" in text:       # mrkdwn markers can't span lines: mark each line
+        return "\n".join(_span({**span, "plain_text": t}, fmt) for t in text.split("\n"))
+    # Slack markers must hug the words, so keep edge spaces outside them
+    core = text.strip()
+    if not core:
+        return text
+    lead, trail = text[:len(text) - len(text.lstrip())], text[len(text.rstrip()):]
+    out = _esc_html(core)
+    for key, mark in (("code", "`"), ("bold", "*"), ("italic", "_"),
+                      ("strikethrough", "~")):
+        if ann.get(key): out = f"{mark}{out}{mark}"
+    if href: out = f"<{_esc_html(href).replace('|', '%7C')}|{out}>"
+    return lead + out + trail
+
+def _rich(spans, fmt: str) -> str:
+    return "".join(_span(s, fmt) for s in spans)
+
+def _render(blocks, fmt: str, depth: int = 0) -> list[str]:
+    """One output line (or pre-formatted chunk) per block, children indented."""
+    bold = {"plain": "{}", "telegram": "<b>{}</b>", "slack": "*{}*"}[fmt]
+    pad, lines, number = "    " * depth, [], 0
+    for b in blocks:
+        kind, body = b["type"], b.get(b["type"], {})
+        number = number + 1 if kind == "numbered_list_item" else 0
+        text = _rich(body.get("rich_text", ()), fmt)
+        line = None
+        if kind == "paragraph":
+            line = text
+        elif kind in ("heading_1", "heading_2", "heading_3"):
+            line = bold.format(text) if text else ""
+        elif kind == "bulleted_list_item":
+            line = f"• {text}"
+        elif kind == "numbered_list_item":
+            line = f"{number}. {text}"
+        elif kind == "to_do":
+            line = ("☑ " if body.get("checked") else "☐ ") + text
+        elif kind in ("toggle", "callout"):
+            icon = (body.get("icon") or {}).get("emoji", "")
+            line = f"{icon} {text}".strip()
+        elif kind == "quote":
+            line = {"plain": text, "telegram": f"<blockquote>{text}</blockquote>",
+                    "slack": "\n".join("> " + l for l in text.split("\n"))}[fmt]
+        elif kind == "code":
+            raw = _rich(body.get("rich_text", ()), "plain")
+            line = {"plain": raw, "telegram": f"<pre>{_esc_html(raw)}</pre>",
+                    "slack": f"```{_esc_html(raw)}```"}[fmt]
+        elif kind == "equation":
+            expr = body.get("expression", "")
+            line = {"plain": expr, "telegram": f"<code>{_esc_html(expr)}</code>",
+                    "slack": f"`{_esc_html(expr)}`"}[fmt]
+        elif kind == "divider":
+            line = "———"
+        if line is not None:
+            lines.append(pad + line)
+        if "children" in b:
+            lines += _render(b["children"], fmt, depth + 1)
+    return lines
+
+_TAG_RE = re.compile(r"<(/?)[a-z]+[^>]*>")
+
+def _tg_len(s: str) -> int:
+    """Telegram counts message length in UTF-16 code units."""
+    return len(s.encode("utf-16-le")) // 2
+
+def split_telegram(html: str, limit: int = TG_TEXT_LIMIT) -> list[str]:
+    """
+    Cut rendered Telegram HTML into messages of at most *limit* characters,
+    only at line breaks outside every tag, so each piece stays valid HTML.
+    Raises ValueError when a single block is too long for one message.
+    """
+    units, cur, depth = [], [], 0
+    for line in html.split("\n"):
+        cur.append(line)
+        for m in _TAG_RE.finditer(line):
+            depth += -1 if m.group(1) else 1
+        if depth <= 0:
+            units.append("\n".join(cur)); cur, depth = [], 0
+    if cur: units.append("\n".join(cur))
+    parts, buf = [], ""
+    for u in units:
+        if _tg_len(u) > limit:
+            raise ValueError(f"A block of this page is longer than Telegram's "
+                             f"{limit}-character message limit; split it in Notion.")
+        joined = f"{buf}\n{u}" if buf else u
+        if _tg_len(joined) <= limit:
+            buf = joined
+        else:
+            parts.append(buf); buf = u
+    if buf: parts.append(buf)
+    return [p.strip("\n") for p in parts if p.strip()]
+
+def _image_src(blk: dict) -> str:
+    img = blk["image"]
+    return img["file"]["url"] if img["type"] == "file" else img["external"]["url"]
+
+async def render_page(blocks) -> PageContent:
+    """Render a fetched block tree and download all of its images."""
+    def text(fmt):
+        return "\n".join(_render(blocks, fmt)).strip()
+
+    async def download(b):
+        # signed file URLs change on every fetch; the block doesn't
+        with metrics().span("media.download"):
+            return await asyncio.to_thread(media_cache().fetch, _image_src(b),
+                                           f"{b['id']}@{b['last_edited_time']}")
+
+    imgs = [b for b in _walk(blocks) if b["type"] == "image"]
+    paths = await asyncio.gather(*(download(b) for b in imgs))
+    return PageContent(text("plain"), text("telegram"), text("slack"), list(paths))
+
+async def fetch_notion_content(token: str, page_url: str) -> PageContent:
+    """
+    Fetch and render the given Notion page: every block (nested ones
+    included), its formatting, and all images via the media cache.
+    """
+    page_id = extract_page_id(page_url)
+    if not page_id:
+        raise ValueError("Couldn’t parse a Notion page ID from that link 🤔")
+    with metrics().span("notion.page"):
+        return await render_page(await fetch_notion_blocks(token, page_id))
+
+
+# ─────────────────────────── pipeline ───────────────────────────
+async def target_pages(platform: str, manual=(), notion_token: str = "", tags=()):
+    """
+    Batches of target names for *platform*: one batch per Notion result
+    page when *notion_token* is given, otherwise the *manual* list.
+    """
+    if notion_token:
+        async for page in iter_notion_targets(notion_token, platform, tags):
+            yield page
+    else:
+        yield list(manual)
+
+async def _ask_stdin(prompt: str) -> str:
+    return (await asyncio.to_thread(input, prompt + " ")).strip()
+
+async def _upload_media(client, path: str):
+    """
+    Upload *path* once and return something every send_file() can reuse
+    without re-uploading: for photos, the server-side InputMediaPhoto
+    (so albums skip the per-send UploadMedia step); otherwise the handle.
+    """
+    from telethon import functions as tl_functions, types as tl_types, utils as tl_utils
+    with metrics().span("telegram.upload"):
+        handle = await client.upload_file(path)
+        metrics().count("bytes_uploaded", os.path.getsize(path), platform="telegram")
+        if not tl_utils.is_image(path):
+            return handle
+        res = await client(tl_functions.messages.UploadMediaRequest(
+            tl_types.InputPeerSelf(), tl_types.InputMediaUploadedPhoto(handle)))
+    return tl_utils.get_input_media(res)
+
+PRIMARY_ACCOUNT = "main"    # my_account.session; extra ones are account-<name>.session
+
+class TelegramAccount:
+    """
+    One authorized session in the send pool, with the state that can't be
+    shared between accounts: the group-name index, the peer cache (access
+    hashes are per account), its own scheduler key, so a FloodWait only
+    pauses this account, and its own send slots.
+    """
+    def __init__(self, name: str, client, dialog_index: DialogIndex,
+                 peer_cache: PeerCache):
+        self.name, self.client = name, client
+        self.dialog_index, self.peer_cache = dialog_index, peer_cache
+        self.platform = "telegram" if name == PRIMARY_ACCOUNT else f"telegram:{name}"
+        self.load = 0       # recipients assigned during the current broadcast
+        self.sem = asyncio.Semaphore(TG_MAX_CONCURRENCY)   # sends in flight
+
+    def __repr__(self):
+        return f"<TelegramAccount {self.name}>"
+
+class Broadcaster:
+    """
+    Everything needed to deliver one message to Telegram and Slack, with no
+    UI attached: clients, caches, the rate-limit scheduler and the delivery
+    journal. *ask(prompt)* is awaited for the interactive Telegram login.
+    """
+    def __init__(self, ask=_ask_stdin):
+        self.ask = ask
+        self.tg_client: "TelegramClient | None" = None
+        self._tg_connect: asyncio.Task | None = None     # in-flight connect()
+        self._tg_creds: tuple | None = None     # what _tg_connect connects with
+        self._slack_session: "aiohttp.ClientSession | None" = None
+        self.slack_client: "AsyncWebClient | None" = None
+        self.scheduler = SendScheduler()
+        self.dialog_index = DialogIndex(
+            os.path.join(_app_dir(), "dialog_index.json"))
+        self.peer_cache = PeerCache(
+            os.path.join(_app_dir(), "peer_cache.json"))
+        self.accounts: dict[str, TelegramAccount] = {}
+        self.journal = DeliveryJournal(os.path.join(_app_dir(), "deliveries.db"))
+
+    # ───────────── clients ─────────────
+    @staticmethod
+    def _session_path(name: str) -> str:
+        return os.path.join(_app_dir(), "my_account.session" if name == PRIMARY_ACCOUNT
+                            else f"account-{name}.session")
+
+    @staticmethod
+    def tg_account_names() -> list[str]:
+        """Names of the extra pool accounts that have a session file."""
+        return sorted(n[len("account-"):-len(".session")]
+                      for n in os.listdir(_app_dir())
+                      if n.startswith("account-") and n.endswith(".session"))
+
+    def account(self, name: str, client=None) -> TelegramAccount:
+        """The pool entry for *name*, (re)bound to *client* when given."""
+        acct = self.accounts.get(name)
+        if acct is None:
+            if name == PRIMARY_ACCOUNT:
+                idx, peers = self.dialog_index, self.peer_cache
+            else:
+                idx = DialogIndex(os.path.join(_app_dir(), f"dialog_index-{name}.json"))
+                peers = PeerCache(os.path.join(_app_dir(), f"peer_cache-{name}.json"))
+            acct = self.accounts[name] = TelegramAccount(name, client, idx, peers)
+        if client is not None: acct.client = client
+        return acct
+
+    def invalidate_dialogs(self) -> None:
+        """Drop the group-name index of every account, loaded or not."""
+        self.dialog_index.invalidate()
+        for a in self.accounts.values(): a.dialog_index.invalidate()
+        for n in os.listdir(_app_dir()):
+            if n.startswith("dialog_index-") and n.endswith(".json"):
+                os.remove(os.path.join(_app_dir(), n))
+
+    async def _connect_tg(self, api_id, api_hash, name: str = PRIMARY_ACCOUNT):
+        # importing Telethon takes ~0.5 s: do it off the (GUI) event-loop thread
+        await asyncio.to_thread(importlib.import_module, "telethon")
+        from telethon import TelegramClient
+        with metrics().span("telegram.connect", account=name):
+            # raise every FloodWait/SlowMode so SendScheduler sees it (pausing
+            # the account, handing recipients over) instead of Telethon
+            # silently sleeping through waits of up to a minute; calls made
+            # outside the scheduler use _sit_out_floods()
+            client = TelegramClient(self._session_path(name), api_id, api_hash,
+                                    flood_sleep_threshold=0)
+            await client.connect()
+        client._update_loop_running = client._keepalive_loop_running = False
+        return client
+
+    async def _login(self, client, who: str = "") -> None:
+        """Interactive sign-in through self.ask, if the session needs it."""
+        from telethon.errors import SessionPasswordNeededError
+        if await client.is_user_authorized(): return
+        who = f" for {who}" if who else ""
+        phone = await self.ask(f"Phone{who} (with country code):")
+        if not phone: raise Exception("Phone required!")
+        # waits Telethon used to sleep through itself (see _connect_tg)
+        await _sit_out_floods(lambda: client.send_code_request(phone), 60)
+        await asyncio.sleep(1)
+        code = await self.ask("Login code:")
+        try:     await _sit_out_floods(lambda: client.sign_in(phone, code), 60)
+        except SessionPasswordNeededError:
+            pw = await self.ask("Password:")
+            await _sit_out_floods(lambda: client.sign_in(password=pw), 60)
+
+    def _start_tg_connect(self, api_id, api_hash) -> asyncio.Task:
+        """The background connect for these credentials, started if needed."""
+        if self._tg_connect and self._tg_creds != (api_id, api_hash):
+            self._drop_tg_connect()
+        if self._tg_connect is None:
+            self._tg_connect = asyncio.create_task(self._connect_tg(api_id, api_hash))
+            self._tg_creds = (api_id, api_hash)
+            # a failed warm-up is retried (and reported) by get_tg_client()
+            self._tg_connect.add_done_callback(
+                lambda t: t.cancelled() or t.exception())
+        return self._tg_connect
+
+    def _drop_tg_connect(self):
+        """
+        Forget the unauthorized connection so the next attempt builds a
+        fresh client. Returns its pending disconnect(), if there is one.
+        """
+        t, self._tg_connect = self._tg_connect, None
+        if t is None: return None
+        if not t.done():
+            t.cancel(); return None
+        if t.cancelled() or t.exception(): return None
+        return asyncio.ensure_future(t.result().disconnect())
+
+    def warm_up(self, api_id, api_hash) -> None:
+        """
+        Start importing Telethon and connecting the session in the
+        background, so the first send doesn't wait for it. Never prompts;
+        get_tg_client() picks the connection up and handles the login.
+        Changed credentials replace a connection that isn't logged in yet.
+        """
+        if self.tg_client or not (api_id and api_hash):
+            return
+        self._start_tg_connect(api_id, api_hash)
+
+    async def get_tg_client(self, api_id, api_hash):
+        if self.tg_client: return self.tg_client
+        if not api_id or not api_hash:
+            raise ValueError("Telegram API credentials missing.")
+        task = self._start_tg_connect(api_id, api_hash)
+        try:
+            client = await task
+            await self._login(client)
+        except BaseException:
+            # e.g. ApiIdInvalid: retry with a new client, not this one
+            if self._tg_connect is task: self._drop_tg_connect()
+            raise
+        self.tg_client = client; return client
+
+    async def add_tg_account(self, api_id, api_hash, name: str) -> TelegramAccount:
+        """Log an extra account into the send pool (prompts through self.ask)."""
+        if not re.fullmatch(r"[\w-]+", name or "") or name == PRIMARY_ACCOUNT:
+            raise ValueError(f"Invalid account name: {name!r}")
+        if not api_id or not api_hash:
+            raise ValueError("Telegram API credentials missing.")
+        client = await self._connect_tg(api_id, api_hash, name)
+        try:
+            await self._login(client, name)
+        except BaseException:
+            await client.disconnect(); raise
+        return self.account(name, client)
+
+    async def get_tg_pool(self, api_id, api_hash) -> list[TelegramAccount]:
+        """
+        The primary account (logging in if needed) followed by every extra
+        account that is still authorized. Extra sessions never prompt; one
+        that was logged out is skipped and reported in metrics.
+        """
+        pool = [self.account(PRIMARY_ACCOUNT,
+                             await self.get_tg_client(api_id, api_hash))]
+        names = [n for n in self.tg_account_names() if n not in self.accounts]
+
+        async def connect(name):
+            client = await self._connect_tg(api_id, api_hash, name)
+            if await client.is_user_authorized():
+                return self.account(name, client)
+            await client.disconnect()
+            raise PermissionError(f"Telegram account {name} is logged out")
+
+        for name, res in zip(names, await asyncio.gather(
+                *(connect(n) for n in names), return_exceptions=True)):
+            if isinstance(res, Exception): metrics().error("telegram.account", res)
+        return pool + [a for n, a in sorted(self.accounts.items())
+                       if n != PRIMARY_ACCOUNT]
+
+    def get_slack_client(self, token):
+        """One AsyncWebClient per token, all sharing a single pooled session."""
+        import aiohttp
+        from slack_sdk.web.async_client import AsyncWebClient
+        if self._slack_session is None or self._slack_session.closed:
+            self._slack_session = aiohttp.ClientSession()
+            self.slack_client = None
+        if self.slack_client is None or self.slack_client.token != token:
+            self.slack_client = AsyncWebClient(
+                token=token, base_url=SLACK_API_URL, session=self._slack_session)
+        return self.slack_client
+
+    async def close(self) -> None:
+        for name, acct in self.accounts.items():
+            if name != PRIMARY_ACCOUNT and acct.client: await acct.client.disconnect()
+        if self.tg_client: await self.tg_client.disconnect()
+        elif pending := self._drop_tg_connect():    # warmed up but never used
+            await pending
+        if self._slack_session: await self._slack_session.close()
+        for cli in _notion_clients.values(): await cli.aclose()
+        _notion_clients.clear()
+
+    # ───────────── Telegram ─────────────
+    async def get_group_ids(self, cli, names):
+        names = [n.strip() for n in names if n.strip()]
+        idx = self.dialog_index
+        if idx.needs_scan(names):
+            await idx.refresh(cli, names)
+        found = [e for n in names if n in idx for e in idx[n]]
+        for e in found:
+            self.peer_cache.learn(str(e["id"]), e["id"], e["access_hash"])
+        return [e["id"] for e in found]
+
+    async def _group_access(self, accounts, names):
+        """
+        [(group id, [accounts that are members])] for the group *names*.
+        Each account scans its dialogs (concurrently) only for names it has
+        neither indexed nor recently found missing.
+        """
+        names = [n.strip() for n in names if n.strip()]
+        await asyncio.gather(*(a.dialog_index.refresh(a.client, names)
+                               for a in accounts if a.dialog_index.needs_scan(names)))
+        access: dict[int, list] = {}
+        for n in names:
+            for a in accounts:
+                for e in (a.dialog_index[n] if n in a.dialog_index else ()):
+                    # resolve from the index's access hash, not by bare ID
+                    a.peer_cache.learn(str(e["id"]), e["id"], e["access_hash"])
+                    members = access.setdefault(e["id"], [])
+                    if a not in members: members.append(a)
+        return list(access.items())
+
+    def _pick(self, accounts):
+        """The account to use next: not flood-limited, then least loaded."""
+        return min(accounts, key=lambda a: (
+            self.scheduler.paused_for(a.platform) > TG_FAILOVER_WAIT, a.load))
+
+    async def _telegram_recipients(self, accounts, channels, group_pages,
+                                   route, bad, done):
+        """
+        Shard *channels*, then each page of group names, across the
+        *accounts* that can reach them, resolve each shard on its account
+        and yield the labels as soon as a batch is ready. *route* gets
+        label → [account, InputPeer, fallback accounts, raw recipient].
+        A recipient that doesn't resolve on one account is tried on the
+        next. Labels in *done* (already delivered) are skipped.
+        """
+        seen = set()
+        for a in accounts: a.load = 0
+
+        async def batch(pairs):
+            pending = list({str(r): (r, list(accs)) for r, accs in pairs
+                            if str(r) not in done}.values())
+            labels = []
+            while pending:
+                shards: dict[TelegramAccount, list] = {}
+                for r, cands in pending:
+                    a = self._pick(cands); cands.remove(a); a.load += 1
+                    shards.setdefault(a, []).append((r, cands))
+                results = await asyncio.gather(*(
+                    a.peer_cache.resolve(a.client, [r for r, _ in rs], self.scheduler,
+                                         TG_MAX_CONCURRENCY, seen, a.platform)
+                    for a, rs in shards.items()))
+                pending = []
+                for (a, rs), (got, failed) in zip(shards.items(), results):
+                    errors = {f.partition(": ")[0]: f for f in failed}
+                    for r, alts in rs:
+                        k = str(r)
+                        if k in got:
+                            route[k] = [a, got[k], alts, r]; labels.append(k)
+                            continue
+                        a.load -= 1             # duplicate, or unreachable from a
+                        if k in errors:
+                            if alts: pending.append((r, alts))
+                            else: bad.append(errors[k])
+            return labels
+
+        for label in await batch([(c.strip(), accounts)
+                                  for c in channels if c.strip()]):
+            yield label
+        async for names in group_pages:
+            for label in await batch(await self._group_access(accounts, names)):
+                yield label
+
+    async def send_telegram(self, client, content: PageContent, channels,
+                            group_pages, resume=False):
+        """
+        Send *content* to every channel/username in *channels* and to
+        every group named in the async iterable *group_pages*. *client* is
+        a TelegramClient, or the account list from get_tg_pool(): then
+        recipients are spread over the accounts that can reach them, sent
+        in parallel, and moved to another account when theirs is
+        flood-limited or loses access.
+        Returns (ok, bad, skipped) where skipped counts recipients a
+        resumed broadcast had already delivered.
+        """
+        accounts = (list(client) if isinstance(client, (list, tuple))
+                    else [self.account(PRIMARY_ACCOUNT, client)])
+        parts = split_telegram(content.telegram)    # refuse before anything is sent
+        uploads: dict[TelegramAccount, asyncio.Future] = {}
+
+        def media_for(a):
+            # every image uploaded once per account; uploads aren't shareable
+            if a not in uploads:
+                uploads[a] = asyncio.ensure_future(asyncio.gather(*(
+                    self.scheduler.run(a.platform,
+                                       lambda p=p: _upload_media(a.client, p))
+                    for p in content.images)))
+            return uploads[a]
+
+        await media_for(accounts[0])            # fail before anything is sent
+        caption = parts[0] if len(parts) == 1 and \
+            _tg_len(content.text) <= TG_CAPTION_LIMIT else None
+
+        bid = self.journal.begin("telegram", DeliveryJournal.digest(content), resume)
+        done = self.journal.delivered(bid)
+        route, bad = {}, []
+
+        async def hand_over(r, raw, alts):
+            """Resolve *r* on the best remaining account that can reach it."""
+            while alts:
+                b = self._pick(alts); alts.remove(b)
+                got, _ = await b.peer_cache.resolve(
+                    b.client, [raw], self.scheduler, 1, None, b.platform)
+                if r in got:
+                    metrics().count("failover", platform="telegram", account=b.name)
+                    return b, got[r]
+            return None
+
+        def stalled(a, alts):
+            # flood-limited for long while another reachable account is free
+            return bool(alts) and self.scheduler.paused_for(a.platform) > TG_FAILOVER_WAIT \
+                and any(not self.scheduler.paused_for(b.platform) for b in alts)
+
+        async def send_one(r):
+            a, peer, alts, raw = route[r]
+            started = False         # once something reached the chat, stay put
+            while True:
+                if stalled(a, alts):
+                    a, peer = await hand_over(r, raw, alts) or (a, peer)
+                # with somewhere to go, don't sit out a long FloodWait
+                max_wait = TG_FAILOVER_WAIT if alts else SEND_MAX_WAIT
+                try:
+                    # slots are per account: a flooded one only holds up its own sends
+                    async with a.sem:
+                        if stalled(a, alts): continue       # flooded while queued
+                        with metrics().span("telegram.send", account=a.name):
+                            media = await media_for(a)
+                            if parts and (not media or caption is None):
+                                for part in parts:
+                                    await self.scheduler.run(a.platform, lambda part=part:
+                                        a.client.send_message(peer, part, parse_mode="html"),
+                                        max_wait)
+                                    started = True
+                            if media:
+                                # a list is sent as album(s) of up to 10, caption on the first
+                                await self.scheduler.run(a.platform, lambda: a.client.send_file(
+                                    peer, media if len(media) > 1 else media[0],
+                                    caption=caption or None, parse_mode="html"), max_wait)
+                    break
+                except Exception as e:
+                    nxt = None
+                    if alts and not started and _telegram_failover(e):
+                        nxt = await hand_over(r, raw, alts)
+                    if nxt is None:
+                        metrics().count("failed", platform="telegram", account=a.name)
+                        self.journal.record(bid, r, str(e))
+                        a.peer_cache.forget(r)      # re-resolve next time
+                        raise
+                    a, peer = nxt
+            metrics().count("sent", platform="telegram", account=a.name)
+            self.journal.record(bid, r)
+
+        ok, failed = await _fan_out(
+            self._telegram_recipients(accounts, channels, group_pages,
+                                      route, bad, done),
+            send_one, None)         # bounded per account by TelegramAccount.sem
+        bad += failed
+        for a in accounts: a.peer_cache.save()
+        if not bad: self.journal.finish(bid)
+        return ok, bad, len(done)
+
+    # ───────────── Slack ─────────────
+    async def send_slack(self, token, content: PageContent, channel_pages,
+                         resume=False):
+        """
+        Post *content* to every channel in the async iterable
+        *channel_pages* (batches of channel IDs). Returns (ok, bad, skipped).
+        """
+        cli = self.get_slack_client(token)
+
+        # upload every image once (unshared), then post one message with the
+        # caption and all permalinks per channel – Slack shares linked files
+        text = content.slack
+        if content.images:
+            title = content.text[:100] or "Image"
+            with metrics().span("slack.upload"):
+                up = await self.scheduler.run("slack", lambda: cli.files_upload_v2(
+                    file_uploads=[{"file": p, "title": title} for p in content.images]))
+            metrics().count("bytes_uploaded", sum(map(os.path.getsize, content.images)),
+                            platform="slack")
+            links = "\n".join(f["permalink"] for f in up["files"])
+            text = f"{text}\n{links}" if text else links
+
+        bid = self.journal.begin("slack", DeliveryJournal.digest(content), resume)
+        done = self.journal.delivered(bid)
+
+        async def pending():
+            seen = set()
+            async for page in channel_pages:
+                for c in page:
+                    c = c.strip()
+                    if c and c not in seen and c not in done:
+                        seen.add(c); yield c
+
+        async def send_one(c):
+            try:
+                with metrics().span("slack.send"):
+                    await self.scheduler.run("slack", lambda: cli.chat_postMessage(
+                        channel=c, text=text, unfurl_links=True, unfurl_media=True))
+            except Exception as e:
+                metrics().count("failed", platform="slack")
+                self.journal.record(bid, c, slack_error(e)); raise
+            metrics().count("sent", platform="slack")
+            self.journal.record(bid, c)
+
+        ok, bad = await _fan_out(pending(), send_one, SLACK_MAX_CONCURRENCY,
+                                 describe=slack_error)
+        if not bad: self.journal.finish(bid)
+        return ok, bad, len(done)
@@ -1,6 +1,20 @@
-from telethon.sync import TelegramClient
-import os
+#!/usr/bin/env python3
+# Export every Telegram group you are in as JSON Lines or CSV, one row per
+# group written as it arrives. Re-running updates the previous export:
+# first_seen is kept, and new / renamed / gone groups are reported.
+#
+#   python fetcher.py                          # → telegram_groups.jsonl
+#   python fetcher.py --out groups.csv
+#   python fetcher.py --full                   # ignore the previous export
+#
+# The export can seed the app's group-name index (skipping the first full
+# dialog scan): "Broadcast > Import group export…" or
+#   python headless.py seed-groups telegram_groups.jsonl
+import os, sys, csv, json, asyncio, argparse
+from datetime import datetime, timezone
 from dotenv import load_dotenv
+from telethon import TelegramClient
+from broadcast import GROUP_EXPORT_FIELDS, read_group_export
 
 # Load environment variables
 load_dotenv()
@@ -10,36 +24,84 @@ API_ID = os.getenv("TELEGRAM_API_ID")  # Replace with your API ID if not using .
 API_HASH = os.getenv("TELEGRAM_API_HASH")  # Replace with your API Hash if not using .env
 SESSION_NAME = "my_telegram"
 
-OUTPUT_FILE = "telegram_groups.txt"  # File to save group list
-
-def save_groups_to_file(groups):
-    """ Save group list to a text file. """
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as file:
-        file.write("📌 Telegram Groups List\n")
-        file.write("=" * 30 + "\n\n")
-        for name, group_id in groups:
-            file.write(f"📌 Group Name: {name}\n")
-            file.write(f"   🔹 Group ID: {group_id}\n")
-            file.write("-" * 40 + "\n")
-
-    print(f"\n✅ Group list saved to {OUTPUT_FILE}\n")
-
-with TelegramClient(SESSION_NAME, API_ID, API_HASH) as client:
-    print("\n📌 Fetching all groups you are a member of...\n")
-    group_list = []
-    
-    for dialog in client.iter_dialogs():
-        if dialog.is_group:
-            group_list.append((dialog.name, dialog.id))
-    
-    if not group_list:
+OUTPUT_FILE = "telegram_groups.jsonl"  # .jsonl or .csv
+
+class ExportWriter:
+    """Streams rows to *path*.part; commit() swaps it in atomically."""
+    def __init__(self, path: str):
+        self.path, self.part = path, path + ".part"
+        self.f = open(self.part, "w", encoding="utf-8", newline="")
+        self.csv = None
+        if path.endswith(".csv"):
+            self.csv = csv.DictWriter(self.f, GROUP_EXPORT_FIELDS)
+            self.csv.writeheader()
+
+    def write(self, row: dict) -> None:
+        if self.csv: self.csv.writerow(row)
+        else: self.f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.f.flush()              # a crash still leaves every row so far
+
+    def commit(self) -> None:
+        self.f.close(); os.replace(self.part, self.path)
+
+    def abort(self) -> None:
+        self.f.close()
+        try: os.remove(self.part)
+        except OSError: pass
+
+async def export_groups(client, path: str, previous: list[dict]) -> dict:
+    """Write every group dialog to *path*; return counts of what changed."""
+    old = {r["id"]: r for r in previous}
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    stats = {"total": 0, "new": 0, "renamed": 0, "removed": 0}
+    out = ExportWriter(path)
+    try:
+        async for dialog in client.iter_dialogs():
+            if not dialog.is_group:
+                continue
+            prev = old.pop(dialog.id, None)
+            row = {"id": dialog.id, "name": dialog.name,
+                   "access_hash": getattr(dialog.entity, "access_hash", None),
+                   "first_seen": prev["first_seen"] if prev else now,
+                   "last_seen": now}
+            out.write(row)
+            stats["total"] += 1
+            if prev is None:
+                stats["new"] += 1; mark = "🆕"
+            elif prev["name"] != dialog.name:
+                stats["renamed"] += 1; mark = f"✏️  (was {prev['name']})"
+            else:
+                mark = ""
+            print(f"📌 {dialog.name}  🔹 {dialog.id} {mark}".rstrip())
+    except BaseException:
+        out.abort(); raise
+    out.commit()
+    for gone in old.values():
+        print(f"❌ no longer listed: {gone['name']}  🔹 {gone['id']}")
+    stats["removed"] = len(old)
+    return stats
+
+async def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Export your Telegram groups.")
+    ap.add_argument("--out", default=OUTPUT_FILE, help="output .jsonl or .csv file")
+    ap.add_argument("--full", action="store_true",
+                    help="don't compare against the previous export")
+    args = ap.parse_args(argv)
+
+    previous = []
+    if not args.full and os.path.exists(args.out):
+        previous = read_group_export(args.out)
+
+    async with TelegramClient(SESSION_NAME, API_ID, API_HASH) as client:
+        print("\n📌 Fetching all groups you are a member of...\n")
+        stats = await export_groups(client, args.out, previous)
+
+    if not stats["total"]:
         print("❌ No groups found.")
-    else:
-        print("✅ Here are all the groups you are in:\n")
-        for name, group_id in group_list:
-            print(f"📌 Group Name: {name}")
-            print(f"   🔹 Group ID: {group_id}")
-            print("-" * 40)
-
-        # Save groups to a file
-        save_groups_to_file(group_list)
+    print(f"\n✅ {stats['total']} groups saved to {args.out} "
+          f"({stats['new']} new, {stats['renamed']} renamed, "
+          f"{stats['removed']} removed)\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# Headless broadcaster: one-shot CLI and a local job daemon. Never imports Qt.
+#
+#   python headless.py login [--account work]     # --account adds a pool account
+#   python headless.py send --page <notion-url> --tags Exchanges,Validators
+#   python headless.py daemon --port 8765 --metrics-port 9108
+#   python headless.py --metrics-log metrics.jsonl send --page <notion-url>
+#
+# Credentials come from the environment (or a .env file):
+#   TELEGRAM_API_ID, TELEGRAM_API_HASH, SLACK_BOT_TOKEN, NOTION_TOKEN
+import os, sys, json, asyncio, argparse
+from dotenv import load_dotenv
+from broadcast import (Broadcaster, Prefetch, target_pages, fetch_notion_content,
+                       notion_cache, media_cache, metrics, read_group_export,
+                       slack_error, PRIMARY_ACCOUNT)
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+METRICS_PORT = 0        # Prometheus /metrics endpoint; 0 = off
+
+# platform → (Notion "Platform" value, job key holding manual targets)
+PLATFORMS = {
+    "telegram": ("Telegram", "telegram_groups"),
+    "slack":    ("Slack", "slack_channels"),
+}
+
+def _env(name: str) -> str:
+    return os.getenv(name, "").strip()
+
+# ----------------------------------------------------------------------
+# one broadcast job
+# ----------------------------------------------------------------------
+async def run_job(bc: Broadcaster, job: dict) -> dict:
+    """
+    Run one broadcast and return {platform: {"ok", "bad", "skipped"}}, or
+    {platform: {"error"}} when a platform fails before sending anything.
+
+    Job keys: page_url (required); platforms (default both); tags – pull
+    targets from Notion instead of the manual lists; telegram_channels,
+    telegram_groups, slack_channels – manual targets; resume.
+    """
+    platforms = job.get("platforms") or list(PLATFORMS)
+    unknown = set(platforms) - set(PLATFORMS)
+    if unknown:
+        raise ValueError(f"Unknown platform(s): {', '.join(sorted(unknown))}")
+    if "slack" in platforms and not _env("SLACK_BOT_TOKEN"):
+        raise ValueError("SLACK_BOT_TOKEN missing.")
+    notion_token, tags = _env("NOTION_TOKEN"), job.get("tags") or []
+    resume = bool(job.get("resume"))
+
+    # target pages start loading now, alongside the page content
+    pages = {p: Prefetch(target_pages(
+                 PLATFORMS[p][0], job.get(PLATFORMS[p][1], ()),
+                 notion_token if tags else "", tags))
+             for p in platforms}
+    try:
+        content = await fetch_notion_content(notion_token, job["page_url"])
+        if not content:
+            raise ValueError("Nothing to send.")
+
+        async def telegram():
+            # a login / credential error only fails this platform
+            pool = await bc.get_tg_pool(_env("TELEGRAM_API_ID"),
+                                        _env("TELEGRAM_API_HASH"))
+            return await bc.send_telegram(
+                pool, content, job.get("telegram_channels", []),
+                pages["telegram"], resume)
+
+        sends = {}
+        if "telegram" in pages:
+            sends["telegram"] = telegram()
+        if "slack" in pages:
+            sends["slack"] = bc.send_slack(
+                _env("SLACK_BOT_TOKEN"), content, pages["slack"], resume)
+        results = await asyncio.gather(*sends.values(), return_exceptions=True)
+    finally:
+        for p in pages.values(): p.close()
+
+    out = {}
+    for name, res in zip(sends, results):
+        if isinstance(res, Exception):
+            metrics().error(f"{name}.broadcast", res)
+            out[name] = {"error": slack_error(res)}
+        else:
+            ok, bad, skipped = res
+            out[name] = {"ok": ok, "bad": bad, "skipped": skipped}
+    return out
+
+def _has_failures(result: dict) -> bool:
+    return any("error" in r or r["bad"] for r in result.values())
+
+# ----------------------------------------------------------------------
+# daemon: newline-delimited JSON jobs over a local TCP socket
+# ----------------------------------------------------------------------
+async def serve_metrics(host: str, port: int):
+    """Expose metrics().prometheus() at http://host:port/metrics."""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=metrics().prometheus(), headers={
+            "Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"[daemon] metrics on http://{host}:{port}/metrics", file=sys.stderr)
+    return runner
+
+async def serve(bc: Broadcaster, host: str, port: int,
+                metrics_port: int = METRICS_PORT) -> None:
+    """
+    Each line a client sends is one job (see run_job); the reply is one
+    JSON line with the result. Jobs from all clients share a single queue
+    and run one at a time, so broadcasts never compete for rate limits.
+    With *metrics_port*, Prometheus can scrape /metrics on the same host.
+    """
+    jobs: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        while True:
+            job, reply = await jobs.get()
+            try:
+                result = await run_job(bc, job)
+            except Exception as e:
+                metrics().error("job", e)
+                result = {"error": str(e)}
+            if not reply.done(): reply.set_result(result)
+
+    async def handle(reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    job = json.loads(line)
+                    if not isinstance(job, dict) or "page_url" not in job:
+                        raise ValueError("job must be an object with page_url")
+                except ValueError as e:
+                    result = {"error": f"bad job: {e}"}
+                else:
+                    reply = asyncio.get_running_loop().create_future()
+                    await jobs.put((job, reply))
+                    result = await reply
+                writer.write((json.dumps(result) + "\n").encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    worker_task = asyncio.create_task(worker())
+    server = await asyncio.start_server(handle, host, port)
+    print(f"[daemon] listening on {host}:{port}", file=sys.stderr)
+    scrape = await serve_metrics(host, metrics_port) if metrics_port else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        worker_task.cancel()
+        if scrape: await scrape.cleanup()
+
+# ----------------------------------------------------------------------
+# command line
+# ----------------------------------------------------------------------
+def _split(values):
+    """Accept both repeated flags and comma-separated values."""
+    return [v.strip() for arg in values or [] for v in arg.split(",") if v.strip()]
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        description="Broadcast a Notion page to Telegram/Slack without the GUI.")
+    ap.add_argument("--metrics-log", metavar="PATH",
+                    help="append timing spans and counters as JSON lines ('-' = stderr)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    lgn = sub.add_parser("login", help="authorize the Telegram session interactively")
+    lgn.add_argument("--account", metavar="NAME",
+                     help="log in an extra account for the send pool")
+    sub.add_parser("clear-cache", help="drop cached Notion data and the group-name indexes")
+    sed = sub.add_parser("seed-groups",
+                         help="load a fetcher.py export into the group-name index")
+    sed.add_argument("export", help="telegram_groups.jsonl / .csv")
+    sed.add_argument("--account", metavar="NAME",
+                     help="pool account the export was made with (default: main)")
+
+    snd = sub.add_parser("send", help="run one broadcast and print the result")
+    snd.add_argument("--page", required=True, help="Notion message page URL")
+    snd.add_argument("--platform", action="append", choices=list(PLATFORMS),
+                     help="limit to one platform (repeatable; default both)")
+    snd.add_argument("--tags", action="append",
+                     help="Notion categories to target instead of manual lists")
+    snd.add_argument("--tg-channel", action="append", default=[],
+                     help="Telegram channel / username")
+    snd.add_argument("--tg-group", action="append", default=[],
+                     help="Telegram group name (repeat for several; names may contain commas)")
+    snd.add_argument("--slack-channel", action="append", default=[],
+                     help="Slack channel ID")
+    snd.add_argument("--resume", action="store_true",
+                     help="skip recipients an unfinished broadcast already reached")
+
+    dmn = sub.add_parser("daemon", help="accept JSON broadcast jobs on a local socket")
+    dmn.add_argument("--host", default=DAEMON_HOST)
+    dmn.add_argument("--port", type=int, default=DAEMON_PORT)
+    dmn.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                     help="serve Prometheus metrics on this port (default off)")
+    return ap
+
+async def _main(args) -> int:
+    bc = Broadcaster()
+    try:
+        if args.command == "login":
+            if args.account:
+                await bc.add_tg_account(_env("TELEGRAM_API_ID"),
+                                        _env("TELEGRAM_API_HASH"), args.account)
+            else:
+                await bc.get_tg_client(_env("TELEGRAM_API_ID"), _env("TELEGRAM_API_HASH"))
+            print("Telegram session authorized.")
+        elif args.command == "clear-cache":
+            notion_cache().invalidate()
+            bc.invalidate_dialogs()
+            print("Caches cleared.")
+        elif args.command == "seed-groups":
+            index = bc.account(args.account or PRIMARY_ACCOUNT).dialog_index
+            added = index.seed(read_group_export(args.export))
+            print(f"{added} groups added to the index.")
+        elif args.command == "send":
+            result = await run_job(bc, {
+                "page_url": args.page,
+                "platforms": args.platform,
+                "tags": _split(args.tags),
+                "telegram_channels": _split(args.tg_channel),
+                "telegram_groups": [g.strip() for g in args.tg_group if g.strip()],
+                "slack_channels": _split(args.slack_channel),
+                "resume": args.resume,
+            })
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+            return 1 if _has_failures(result) else 0
+        elif args.command == "daemon":
+            await serve(bc, args.host, args.port, args.metrics_port)
+        return 0
+    finally:
+        await bc.close()
+        media_cache().prune()
+
+def main(argv=None) -> int:
+    load_dotenv()
+    args = build_parser().parse_args(argv)
+    metrics().log = args.metrics_log
+    try:
+        return asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 from setuptools import setup
 
 APP = ['app.py']
-DATA_FILES = ['ui_mainwindow.py']
+DATA_FILES = ['ui_mainwindow.py', 'broadcast.py']
 OPTIONS = {
     # 'argv_emulation': True,  # (optional; remove if not needed)
     'includes': [
@@ -11,6 +11,7 @@ OPTIONS = {
         'notion_client',
         'dotenv',     # for python-dotenv
         'qasync',     # add qasync here
+        'aiohttp',    # async Slack client transport
     ],
     'packages': [
         'PyQt6',
@@ -26,8 +27,9 @@ OPTIONS = {
         'idna',
         'charset_normalizer',
         'qasync',     # and include qasync in packages too
+        'aiohttp',
     ],
-    'resources': ['ui_mainwindow.py'],
+    'resources': ['ui_mainwindow.py', 'broadcast.py'],
 }
 
 setup(
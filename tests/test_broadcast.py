@@ -0,0 +1,200 @@
+# Offline checks for the pure parts of broadcast.py. Run: python -m pytest tests
+import asyncio
+import pytest
+from types import SimpleNamespace
+from telethon.errors import FloodWaitError
+
+import broadcast
+from broadcast import (DeliveryJournal, DialogIndex, SendScheduler, SEND_MAX_ATTEMPTS, _fan_out,
+                       _render, _span, _tg_len, split_telegram)
+
+FAST = {"telegram": (1000, 1000), "slack": (1000, 1000)}
+
+def _calls(*outcomes):
+    """A call() factory that raises/returns *outcomes* in turn, and counts."""
+    it, n = iter(outcomes), [0]
+
+    async def call():
+        n[0] += 1
+        x = next(it)
+        if isinstance(x, BaseException): raise x
+        return x
+    return call, n
+
+def _flood(seconds):
+    return FloodWaitError(request=None, capture=seconds)
+
+# ----------------------------------------------------------------------
+# SendScheduler.run
+# ----------------------------------------------------------------------
+def test_run_retries_transient_error(monkeypatch):
+    monkeypatch.setattr(broadcast.random, "random", lambda: 0.0)   # 0.5 s backoff
+    sched = SendScheduler(FAST)
+    call, n = _calls(ConnectionError("reset"), "ok")
+    assert asyncio.run(sched.run("telegram", call)) == "ok"
+    assert n[0] == 2 and sched.retries == 1
+
+def test_run_honours_flood_wait_hint():
+    sched = SendScheduler(FAST)
+    call, n = _calls(_flood(0), _flood(0), "ok")
+    assert asyncio.run(sched.run("telegram", call)) == "ok"
+    assert n[0] == 3 and sched.retries == 2
+
+def test_run_raises_non_retryable_unchanged():
+    sched = SendScheduler(FAST)
+    err = ValueError("bad peer")
+    call, n = _calls(err)
+    with pytest.raises(ValueError) as exc:
+        asyncio.run(sched.run("telegram", call))
+    assert exc.value is err and n[0] == 1 and sched.retries == 0
+
+def test_run_gives_up_after_max_attempts():
+    sched = SendScheduler(FAST)
+    call, n = _calls(*[_flood(0)] * SEND_MAX_ATTEMPTS)
+    with pytest.raises(FloodWaitError):
+        asyncio.run(sched.run("telegram", call))
+    assert n[0] == SEND_MAX_ATTEMPTS
+
+def test_run_raises_long_hint_and_pauses_only_that_account():
+    sched = SendScheduler(FAST)
+    call, n = _calls(_flood(120))
+    with pytest.raises(FloodWaitError):
+        asyncio.run(sched.run("telegram:a", call, max_wait=10))
+    assert n[0] == 1
+    assert sched.paused_for("telegram:a") > 100
+    assert sched.paused_for("telegram:b") == 0
+    # the other account's bucket still hands out tokens right away
+    call, _ = _calls("ok")
+    assert asyncio.run(asyncio.wait_for(sched.run("telegram:b", call), 1)) == "ok"
+
+# ----------------------------------------------------------------------
+# _fan_out
+# ----------------------------------------------------------------------
+def test_fan_out_keeps_order_and_limit():
+    running, peak = [0], [0]
+
+    async def send(t):
+        running[0] += 1; peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        if t == "b": raise RuntimeError("nope")
+
+    ok, bad = asyncio.run(_fan_out(["a", "b", "c", "d"], send, 2))
+    assert ok == ["a", "c", "d"] and bad == ["b: nope"]
+    assert peak[0] == 2
+
+def test_fan_out_reports_failing_async_source():
+    sent = []
+
+    async def targets():
+        yield "a"; yield "b"
+        raise ConnectionError("notion down")
+
+    async def send(t):
+        sent.append(t)
+
+    ok, bad = asyncio.run(_fan_out(targets(), send, 4))
+    assert ok == ["a", "b"] and sent == ["a", "b"]
+    assert bad == ["(target list): notion down"]
+
+# ----------------------------------------------------------------------
+# DeliveryJournal.begin(resume=True)
+# ----------------------------------------------------------------------
+@pytest.fixture
+def journal(tmp_path):
+    j = DeliveryJournal(str(tmp_path / "deliveries.db"))
+    yield j
+    j.db.close()
+
+def test_resume_picks_unfinished_broadcast_of_same_message(journal):
+    bid = journal.begin("telegram", "d1", resume=False)
+    journal.record(bid, "a")
+    journal.record(bid, "b", "FloodWait")
+    assert journal.begin("telegram", "d1", resume=True) == bid
+    assert journal.delivered(bid) == {"a"}          # failed ones are retried
+
+def test_resume_ignores_other_platforms_and_messages(journal):
+    bid = journal.begin("telegram", "d1", resume=False)
+    assert journal.begin("slack", "d1", resume=True) != bid
+    assert journal.begin("telegram", "d2", resume=True) != bid
+
+def test_resume_starts_fresh_after_finish(journal):
+    bid = journal.begin("telegram", "d1", resume=False)
+    journal.record(bid, "a")
+    journal.finish(bid)
+    new = journal.begin("telegram", "d1", resume=True)
+    assert new != bid and journal.delivered(new) == set()
+
+def test_no_resume_always_starts_fresh(journal):
+    bid = journal.begin("telegram", "d1", resume=False)
+    assert journal.begin("telegram", "d1", resume=False) != bid
+
+# ----------------------------------------------------------------------
+# Notion → Telegram HTML / Slack mrkdwn
+# ----------------------------------------------------------------------
+def _text(text, href=None, **ann):
+    return {"plain_text": text, "annotations": ann, "href": href}
+
+def test_span_escapes_quotes_in_telegram_href():
+    out = _span(_text("x", href='https://e.com/?q="a"&b=1'), "telegram")
+    assert out == '<a href="https://e.com/?q=&quot;a&quot;&amp;b=1">x</a>'
+
+def test_span_escapes_pipe_in_slack_href():
+    out = _span(_text("x", href="https://e.com/?a|b<c"), "slack")
+    assert out == "<https://e.com/?a%7Cb&lt;c|x>"
+
+def test_slack_markers_are_applied_per_line():
+    assert _span(_text("one \ntwo", bold=True), "slack") == "*one* \n*two*"
+    quote = {"type": "quote", "quote": {"rich_text": [_text("q1\nq2", italic=True)]}}
+    assert _render([quote], "slack") == ["> _q1_\n> _q2_"]
+
+def test_split_never_cuts_inside_pre():
+    code = {"type": "code", "code": {"rich_text": [_text("\n".join(["line"] * 8))]}}
+    para = {"type": "paragraph", "paragraph": {"rich_text": [_text("p" * 30)]}}
+    html = "\n".join(_render([para, code, para], "telegram"))
+    parts = split_telegram(html, limit=60)
+    assert len(parts) == 3 and parts[1].startswith("<pre>") and parts[1].endswith("</pre>")
+    assert "\n".join(parts) == html
+
+def test_split_refuses_single_block_over_limit():
+    with pytest.raises(ValueError):
+        split_telegram("short\n<b>" + "x" * 100 + "</b>", limit=50)
+
+def test_split_counts_utf16_units():
+    assert _tg_len("a😀") == 3
+    # 10 units per line: two lines and their newline fit in 21, not in 20
+    lines = "\n".join(["😀" * 5] * 4)
+    assert split_telegram(lines, limit=21) == ["😀" * 5 + "\n" + "😀" * 5] * 2
+    assert split_telegram(lines, limit=20) == ["😀" * 5] * 4
+
+# ----------------------------------------------------------------------
+# DialogIndex.refresh
+# ----------------------------------------------------------------------
+class _Dialogs:
+    """iter_dialogs() over *groups*, raising FloodWait(0) after *flood_at* once."""
+    def __init__(self, groups, flood_at=None):
+        self.groups, self.flood_at, self.scans = groups, flood_at, 0
+
+    async def iter_dialogs(self):
+        self.scans += 1
+        for i, (gid, name) in enumerate(self.groups):
+            if i == self.flood_at and self.scans == 1:
+                raise _flood(0)
+            yield SimpleNamespace(is_group=True, id=gid, name=name,
+                                  entity=SimpleNamespace(access_hash=gid * 7))
+
+def test_refresh_sits_out_flood_wait_and_finishes(tmp_path):
+    idx, cli = DialogIndex(str(tmp_path / "idx.json")), _Dialogs(
+        [(-1, "a"), (-2, "b"), (-3, "a")], flood_at=2)
+    asyncio.run(idx.refresh(cli, ["a", "gone"]))
+    assert cli.scans == 2 and idx.complete
+    assert [e["id"] for e in idx["a"]] == [-1, -3]
+
+def test_missing_names_do_not_rescan_until_invalidated(tmp_path):
+    path = str(tmp_path / "idx.json")
+    idx = DialogIndex(path)
+    asyncio.run(idx.refresh(_Dialogs([(-1, "a")]), ["a", "gone"]))
+    reloaded = DialogIndex(path)
+    assert not reloaded.needs_scan(["a", "gone"]) and reloaded.needs_scan(["new"])
+    reloaded.invalidate()
+    assert reloaded.needs_scan(["a"])